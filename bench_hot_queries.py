@@ -0,0 +1,116 @@
+"""
+Benchmark the precompiled hot-path queries (utils.hot_queries) against the
+db.query(...).filter(...) versions they replaced.
+
+Usage:
+    python bench_hot_queries.py                      # in-memory SQLite
+    python bench_hot_queries.py --url postgresql://... --iterations 5000
+
+Against a real database the round trip dominates wall time; the CPU column
+(process time per call) is the per-request overhead that was saved.
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import login, customer, order, order_temp, user, rate_limit, rollup, report_job  # noqa: F401
+from models.customer import Customer
+from models.order import Order
+from models.user import User, UserRole
+from utils import hot_queries
+
+
+def seed(session) -> None:
+    agent = User(name="Bench Agent", email="bench@example.com", phone="9000000000",
+                 password="x", role=UserRole.agent)
+    session.add(agent)
+    session.flush()
+    shop = Customer(shop_name="Bench Shop", owner_name="Owner", phone="9000000001",
+                    address="Street", pincode="600001")
+    session.add(shop)
+    session.flush()
+    session.add_all([
+        Order(customer_id=shop.id, delivered_by=agent.id, bottles_holding=i % 7)
+        for i in range(200)
+    ])
+    session.commit()
+
+
+def orm_agent_totals(db, user_id):
+    return db.query(Order).filter(Order.delivered_by == user_id).with_entities(
+        func.count(Order.order_id).label("total_orders"),
+        func.coalesce(func.sum(Order.trays_holding), 0).label("total_trays_outside"),
+        func.coalesce(func.sum(Order.trays_returned), 0).label("total_trays_received"),
+        func.coalesce(func.sum(Order.bottles_holding), 0).label("total_bottles_delivered"),
+        func.coalesce(func.sum(Order.bottles_returned), 0).label("total_bottles_returned"),
+        func.coalesce(func.sum(Order.bottles_damaged), 0).label("total_bottles_damaged"),
+    ).first()
+
+
+CASES = [
+    ("get_order",
+     lambda db: db.query(Order).filter(Order.order_id == 100).first(),
+     lambda db: hot_queries.get_order(db, 100)),
+    ("get_customer",
+     lambda db: db.query(Customer).filter(Customer.id == 1).first(),
+     lambda db: hot_queries.get_customer(db, 1)),
+    ("login by email",
+     lambda db: db.query(User).filter(func.lower(User.email) == func.lower("Bench@example.com")).first(),
+     lambda db: hot_queries.user_by_email(db, "Bench@example.com")),
+    ("login by phone",
+     lambda db: db.query(User).filter(User.phone == "9000000000").first(),
+     lambda db: hot_queries.user_by_phone(db, "9000000000")),
+    ("agent summary",
+     lambda db: orm_agent_totals(db, 1),
+     lambda db: hot_queries.agent_order_totals(db, 1)),
+]
+
+
+def measure(Session, fn, iterations: int) -> tuple[float, float]:
+    """Microseconds per call (CPU, wall); one session per call, like a request"""
+    for _ in range(50):  # warm up caches
+        with Session() as db:
+            fn(db)
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(iterations):
+        with Session() as db:
+            fn(db)
+    return (
+        (time.process_time() - cpu) / iterations * 1e6,
+        (time.perf_counter() - wall) / iterations * 1e6,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Hot query benchmark")
+    parser.add_argument("--url", default="sqlite://", help="Database URL (default: in-memory SQLite)")
+    parser.add_argument("--iterations", type=int, default=3000)
+    args = parser.parse_args()
+
+    if args.url.startswith("sqlite"):
+        engine = create_engine(args.url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            seed(db)
+    else:
+        # Uses existing data (the IDs above should exist)
+        engine = create_engine(args.url)
+        Session = sessionmaker(bind=engine)
+
+    print(f"{'query':<16} {'orm cpu µs':>11} {'hot cpu µs':>11} {'saved':>7} {'orm wall µs':>12} {'hot wall µs':>12}")
+    for name, orm_fn, hot_fn in CASES:
+        orm_cpu, orm_wall = measure(Session, orm_fn, args.iterations)
+        hot_cpu, hot_wall = measure(Session, hot_fn, args.iterations)
+        saved = (orm_cpu - hot_cpu) / orm_cpu * 100 if orm_cpu else 0.0
+        print(f"{name:<16} {orm_cpu:>11.1f} {hot_cpu:>11.1f} {saved:>6.0f}% {orm_wall:>12.1f} {hot_wall:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,7 +5,8 @@ This module handles:
 - SQLAlchemy engine creation
 - SessionLocal for database sessions
 - Base class for ORM models
-- get_db() dependency for FastAPI routes
+- get_db() (read-write) and get_readonly_db() (primary, no commit) dependencies
+- Optional read replica (READ_DATABASE_URL) and get_read_db() dependency
 
 Environment Support:
 - dev_local: Local development database
@@ -13,7 +14,14 @@ Environment Support:
 """
 
 import os
-from sqlalchemy import create_engine
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
@@ -89,46 +97,297 @@ else:
     pool_size = 10
     max_overflow = 20
 
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts wait for a free connection,
+    reported by /health/ready via pool_stats().
+    """
+
+    # Checkouts slower than this count as having waited
+    WAIT_THRESHOLD = 0.005
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                if elapsed >= self.WAIT_THRESHOLD:
+                    self.waits += 1
+                    self.total_wait += elapsed
+                    self.max_wait = max(self.max_wait, elapsed)
+
+
+def pool_stats(pool) -> dict:
+    """Size, usage and checkout wait statistics for a connection pool"""
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+    }
+    stats["exhausted"] = stats["checked_out"] >= stats["size"] + max(stats["max_overflow"], 0)
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update({
+            "checkouts": pool.checkouts,
+            "waits": pool.waits,
+            "timeouts": pool.timeouts,
+            "avg_wait_ms": round(pool.total_wait / pool.waits * 1000, 1) if pool.waits else 0.0,
+            "max_wait_ms": round(pool.max_wait * 1000, 1),
+        })
+    return stats
+
+
+# Compiled statements kept per engine (SQLAlchemy's default is 500)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1000"))
+# psycopg 3 prepares a statement on the server after this many executions
+# on a connection; psycopg2 (plain postgresql:// URLs) has no equivalent
+PG_PREPARE_THRESHOLD = int(os.getenv("PG_PREPARE_THRESHOLD", "2"))
+# PostgreSQL statement_timeout for every connection, in milliseconds
+# (0 disables). Route groups and background jobs can override it, see
+# statement_timeout() below.
+STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", "15000"))
+
+
+def driver_connect_args(url: str) -> dict:
+    """
+    Driver-specific connect() arguments: server-side prepared statements
+    and the default statement_timeout
+    """
+    drivername = make_url(url).drivername
+    args = {}
+    if drivername == "postgresql+psycopg":
+        args["prepare_threshold"] = PG_PREPARE_THRESHOLD
+    if drivername.startswith("postgresql") and STATEMENT_TIMEOUT_MS > 0:
+        args["options"] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+    return args
+
+
 engine = create_engine(
     DATABASE_URL,
-    poolclass=QueuePool,
+    poolclass=InstrumentedQueuePool,
     pool_size=pool_size,
     max_overflow=max_overflow,
     pool_pre_ping=True,  # Verify connections before using them
+    query_cache_size=QUERY_CACHE_SIZE,
+    connect_args=driver_connect_args(DATABASE_URL),
     echo=False  # Set to True for SQL query logging (debugging)
 )
 
 # Session factory
+# expire_on_commit=False: objects keep their loaded values after commit,
+# so write handlers can return them without a re-read (db.refresh)
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
-    autocommit=False
+    autocommit=False,
+    expire_on_commit=False
 )
 
+# -----------------------------
+# READ REPLICA (OPTIONAL)
+# -----------------------------
+
+# Reporting and list queries can be served from a read-only replica so they
+# don't compete with order writes for the primary pool.
+# If READ_DATABASE_URL is not set, reads simply go to the primary.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+
+# After a client writes, its reads go to the primary for this many seconds
+# so it always sees its own writes despite replication lag.
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+# Behind a proxy (e.g. Render) the client IP comes from X-Forwarded-For
+TRUST_PROXY_HEADERS = os.getenv(
+    "TRUST_PROXY_HEADERS", "1" if os.getenv("RENDER") else "0"
+).lower() in ("1", "true", "yes")
+
+if READ_DATABASE_URL:
+    read_engine = create_engine(
+        READ_DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=int(os.getenv("READ_POOL_SIZE", pool_size)),
+        max_overflow=int(os.getenv("READ_MAX_OVERFLOW", max_overflow)),
+        pool_pre_ping=True,
+        query_cache_size=QUERY_CACHE_SIZE,
+        connect_args=driver_connect_args(READ_DATABASE_URL),
+        echo=False
+    )
+    ReadSessionLocal = sessionmaker(
+        bind=read_engine,
+        autoflush=False,
+        autocommit=False,
+        expire_on_commit=False
+    )
+else:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
+
+
+# -----------------------------
+# STATEMENT TIMEOUT OVERRIDES
+# -----------------------------
+
+# Timeout (ms, 0 = none) for transactions started in the current context,
+# when it differs from STATEMENT_TIMEOUT_MS. Set per request by
+# utils.bulkheads and around background jobs.
+_statement_timeout: ContextVar[Optional[int]] = ContextVar("statement_timeout", default=None)
+
+
+@contextmanager
+def statement_timeout(ms: Optional[int]):
+    """Run transactions begun inside this block with another statement_timeout"""
+    token = _statement_timeout.set(ms)
+    try:
+        yield
+    finally:
+        _statement_timeout.reset(token)
+
+
+def _apply_statement_timeout(conn) -> None:
+    ms = _statement_timeout.get()
+    if ms is not None and ms != STATEMENT_TIMEOUT_MS:
+        # Reverts by itself when the transaction ends
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(ms)}")
+
+
+for _engine in {engine, read_engine}:
+    if _engine.dialect.name == "postgresql":
+        event.listen(_engine, "begin", _apply_statement_timeout)
+
 # Base class for all models
 Base = declarative_base()
 
 
+# -----------------------------
+# READ-YOUR-WRITES TRACKING
+# -----------------------------
+
+# client key -> monotonic time of its last committed write
+_last_write_at: dict[str, float] = {}
+_last_write_lock = threading.Lock()
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            # The right-most entry is the one added by our proxy
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def client_key(request: Request) -> str:
+    """
+    Identify the calling client for read-your-writes routing.
+    Uses the X-Client-Id header when the app sends one, else the client IP
+    (from X-Forwarded-For behind a proxy, as for rate limiting).
+    """
+    client_id = request.headers.get("X-Client-Id")
+    if client_id:
+        return client_id
+    return client_ip(request)
+
+
+def mark_write(request: Request) -> None:
+    """Record that this client just committed a write on the primary"""
+    now = time.monotonic()
+    with _last_write_lock:
+        _last_write_at[client_key(request)] = now
+        # Drop expired entries so the map doesn't grow forever
+        if len(_last_write_at) > 10000:
+            cutoff = now - READ_YOUR_WRITES_WINDOW
+            for key in [k for k, t in _last_write_at.items() if t < cutoff]:
+                del _last_write_at[key]
+
+
+def wrote_recently(request: Request) -> bool:
+    """True if this client wrote within READ_YOUR_WRITES_WINDOW seconds"""
+    last = _last_write_at.get(client_key(request))
+    return last is not None and time.monotonic() - last < READ_YOUR_WRITES_WINDOW
+
+
 # -----------------------------
 # DEPENDENCY: GET DB SESSION
 # -----------------------------
 
-def get_db():
+def get_db(request: Request):
     """
-    Creates a new SQLAlchemy database session for each request.
+    Read-write session for endpoints that change data.
 
-    This function is used in FastAPI dependency injection.
-    It ensures:
-    - opening a DB session before request
-    - closing the session after request is finished
-    - proper transaction rollback on errors
+    Handlers commit their single transaction themselves, so commit errors
+    reach their error handling before the response is sent. A transaction
+    the handler left open is committed here; on any error it is rolled back.
+    Read-only endpoints should use get_readonly_db or get_read_db instead.
     """
     db = SessionLocal()
     try:
         yield db
-        db.commit()  # Commit if no exceptions
+        if db.in_transaction():
+            db.commit()
+        if request.method in WRITE_METHODS:
+            mark_write(request)
     except Exception:
         db.rollback()  # Rollback on any error
         raise
     finally:
         db.close()
+
+
+# -----------------------------
+# DEPENDENCY: GET READ-ONLY PRIMARY SESSION
+# -----------------------------
+
+def get_readonly_db():
+    """
+    Read-only session on the primary, for lookups that must see the latest
+    writes of any client (e.g. GET by ID right after another device created
+    the row). Nothing is committed; the transaction is rolled back.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.rollback()
+        db.close()
+
+
+# -----------------------------
+# DEPENDENCY: GET READ-ONLY DB SESSION
+# -----------------------------
+
+def get_read_db(request: Request):
+    """
+    Creates a read-only session for reporting and list endpoints.
+
+    Uses the read replica when READ_DATABASE_URL is configured, except for
+    clients that wrote recently: those read from the primary so they see
+    their own changes. Nothing is committed; the transaction is rolled back.
+    """
+    if wrote_recently(request):
+        db = SessionLocal()
+    else:
+        db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.rollback()
+        db.close()
@@ -0,0 +1,38 @@
+"""
+Bulk import customers or historical orders from the command line.
+
+Usage:
+    python import_data.py customers shops.csv
+    python import_data.py orders history.ndjson --chunk-size 5000
+"""
+import argparse
+import sys
+
+from database import engine, statement_timeout
+from schemas.bulk_import import ImportKind
+from utils.bulk_import import DEFAULT_CHUNK_SIZE, detect_format, import_file
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import OG Soda data")
+    parser.add_argument("kind", choices=[k.value for k in ImportKind])
+    parser.add_argument("path", help="CSV or NDJSON file ('-' for stdin)")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if args.path == "-":
+        result = import_file(engine, args.kind, sys.stdin, fmt=fmt, chunk_size=args.chunk_size)
+    else:
+        with open(args.path, encoding="utf-8-sig", newline="") as stream:
+            result = import_file(engine, args.kind, stream, fmt=fmt, chunk_size=args.chunk_size)
+
+    print(result.model_dump_json(indent=2))
+    return 0 if result.rows_invalid == 0 else 1
+
+
+if __name__ == "__main__":
+    # These can run far longer than any request
+    with statement_timeout(0):
+        sys.exit(main())
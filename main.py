@@ -1,3 +1,6 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -5,28 +8,36 @@ from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from contextlib import asynccontextmanager
 from database import Base, engine
+from utils.write_behind import run_flusher
+from utils.events import start_listener
+from utils.partitions import ensure_partitions
+from utils.maintenance import run_maintenance
+from utils.jobs import run_job_poller, shutdown as shutdown_jobs
+from utils.startup import FAST_START, RoutersGate, ensure_schema, ensure_unique_indexes, record, startup_timings, timed
+from utils.structured_logging import RequestIdMiddleware, configure_logging
+from utils.bulkheads import BulkheadMiddleware, bulkhead_stats
+import asyncio
+import importlib
 import logging
-import traceback
 import os
 
 # Import models so SQLAlchemy creates tables
-from models import login, customer, order, order_temp, user
-
-# Import routers
-from routers import (
-    login as login_router,
-    customers,
-    orders,
-    admin,
-    order_temp as order_temp_router,
-    users,
-)
+from models import login, customer, order, order_temp, user, rate_limit, rollup, report_job
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Routers, in inclusion order. With FAST_START they are imported in the
+# background after startup instead of here.
+ROUTER_MODULES = [
+    "routers.login",
+    "routers.customers",
+    "routers.orders",
+    "routers.admin",
+    "routers.order_temp",
+    "routers.users",
+    "routers.reports",
+]
+
+# Configure logging (JSON lines written by a background thread, see utils.structured_logging)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -45,8 +56,13 @@ async def lifespan(app: FastAPI):
     logger.info(f"DATABASE_URL set: {bool(os.getenv('DATABASE_URL'))}")
     
     try:
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
+        with timed("schema"):
+            # Monthly order partitions (PostgreSQL with ORDERS_PARTITIONED=1)
+            ensure_partitions(engine)
+            # Create all tables (skipped with FAST_START if schema is unchanged)
+            ensure_schema(engine, Base.metadata)
+            # Upsert targets create_all doesn't add to existing tables
+            ensure_unique_indexes(engine, [customer.CUSTOMER_KEY_INDEX])
         logger.info("Database connection established")
     except Exception as e:
         logger.error(f"Database connection error: {str(e)}")
@@ -56,10 +72,67 @@ async def lifespan(app: FastAPI):
         logger.error("3. Database credentials are correct")
         raise
     
+    # Background flush of write-behind buffers (e.g. last_login)
+    flusher = asyncio.create_task(run_flusher(engine))
+    
+    # Dashboard events from other workers (PostgreSQL LISTEN/NOTIFY)
+    events_listener = start_listener(engine)
+    
+    # Periodic cleanup (e.g. expiring stale order_temp drafts)
+    maintenance = asyncio.create_task(run_maintenance(engine))
+    
+    # Background report jobs left queued (e.g. by a restarted worker)
+    report_poller = asyncio.create_task(run_job_poller(engine))
+    
+    if FAST_START:
+        asyncio.create_task(load_routers_in_background())
+    logger.info("Startup timings (ms): %s", startup_timings)
+    
     yield
     
     # Shutdown
     logger.info("OG Soda FastAPI Service shutting down...")
+    if events_listener:
+        events_listener.stop()
+    maintenance.cancel()
+    report_poller.cancel()
+    shutdown_jobs()
+    flusher.cancel()
+    try:
+        await flusher
+    except asyncio.CancelledError:
+        pass
+
+
+def include_routers(modules) -> None:
+    for module in modules:
+        app.include_router(module.router)
+    # Routes changed; regenerate the OpenAPI schema on next request
+    app.openapi_schema = None
+    routers_ready.set()
+
+
+async def load_routers_in_background() -> None:
+    """FAST_START: import routers off the event loop, then include them"""
+    try:
+        with timed("routers"):
+            modules = await asyncio.to_thread(
+                lambda: [importlib.import_module(name) for name in ROUTER_MODULES]
+            )
+            include_routers(modules)
+    except Exception as e:
+        # Release waiting requests (they get 503) and fail readiness
+        logger.exception("Loading routers failed")
+        routers_failed.append(f"{type(e).__name__}: {e}")
+        routers_ready.set()
+        return
+    logger.info("Routers loaded; startup timings (ms): %s", startup_timings)
+
+
+# Set once routers are included (or failed to load); requests other than /health wait for it
+routers_ready = asyncio.Event()
+# Error from loading routers in the background, if it failed
+routers_failed: list[str] = []
 
 
 app = FastAPI(
@@ -71,6 +144,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Per-route-group concurrency limits; heavy groups queue or get 503
+app.add_middleware(BulkheadMiddleware)
+
+# Hold requests until lazily loaded routers are ready (FAST_START)
+app.add_middleware(RoutersGate, ready=routers_ready, failed=routers_failed)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -80,22 +159,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost: tag every log record with the request's ID
+app.add_middleware(RequestIdMiddleware)
+
 
 # Exception handlers
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     """Handle HTTP exceptions"""
-    logger.warning(f"HTTP {exc.status_code}: {exc.detail}")
+    logger.warning(
+        "HTTP %s on %s %s: %s", exc.status_code, request.method, request.url.path, exc.detail,
+        extra={"sample_key": f"http_{exc.status_code}"}
+    )
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail, "status_code": exc.status_code}
+        content={"detail": exc.detail, "status_code": exc.status_code},
+        headers=getattr(exc, "headers", None)
     )
 
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle validation errors"""
-    logger.warning(f"Validation error: {exc.errors()}")
+    logger.warning(
+        "Validation error on %s %s: %s", request.method, request.url.path, exc.errors(),
+        extra={"sample_key": "validation"}
+    )
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors(), "status_code": 422}
@@ -105,7 +194,8 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle all other exceptions"""
-    logger.error(f"Unhandled exception: {str(exc)}\n{traceback.format_exc()}")
+    # Traceback is formatted on the logging thread, not here
+    logger.error("Unhandled exception on %s %s: %s", request.method, request.url.path, exc, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -115,36 +205,100 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+# Health check endpoints
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "5"))
+_last_db_check: dict = {"checked_at": 0.0, "connected": None, "error": None}
+
+
+def _check_database() -> dict:
+    """
+    SELECT 1 on the primary, at most once per HEALTH_CACHE_TTL seconds.
+    If the pool is exhausted the last known result is reused, so probes
+    never queue behind requests for a connection.
+    """
+    from database import engine, pool_stats
+    from sqlalchemy import text
+    now = time.monotonic()
+    cached = now - _last_db_check["checked_at"] < HEALTH_CACHE_TTL
+    if cached or (pool_stats(engine.pool)["exhausted"] and _last_db_check["connected"]):
+        return {**_last_db_check, "cached": True}
     try:
-        # Test database connection
-        from database import engine
-        from sqlalchemy import text
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
-        return {
-            "status": "healthy",
-            "database": "connected"
-        }
+        _last_db_check.update(connected=True, error=None)
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
+        _last_db_check.update(connected=False, error=str(e))
+    _last_db_check["checked_at"] = now
+    return {**_last_db_check, "cached": False}
+
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and serving. Never touches the database."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """
+    Readiness: database reachable (checked at most every HEALTH_CACHE_TTL
+    seconds) and routers loaded, plus connection pool and bulkhead diagnostics.
+    """
+    from database import engine, read_engine, pool_stats
+    check = await asyncio.to_thread(_check_database)
+    pool = pool_stats(engine.pool)
+    content = {
+        "status": "ready" if check["connected"] else "unavailable",
+        "database": "connected" if check["connected"] else "disconnected",
+        "cached": check["cached"],
+        "pool": pool,
+    }
+    if read_engine is not engine:
+        content["read_pool"] = pool_stats(read_engine.pool)
+    content["bulkheads"] = bulkhead_stats()
+    if check["connected"] and pool["exhausted"]:
+        content["status"] = "degraded"
+    if not check["connected"]:
+        content["error"] = check["error"]
+        return JSONResponse(status_code=503, content=content)
+    if routers_failed:
+        content["status"] = "unavailable"
+        content["error"] = f"Routers failed to load: {routers_failed[0]}"
+        return JSONResponse(status_code=503, content=content)
+    return content
+
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint (kept for compatibility; same check as /health/ready)"""
+    check = await asyncio.to_thread(_check_database)
+    if not check["connected"]:
         return JSONResponse(
             status_code=503,
             content={
                 "status": "unhealthy",
                 "database": "disconnected",
-                "error": str(e)
+                "error": check["error"]
+            }
+        )
+    if routers_failed:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "unhealthy",
+                "database": "connected",
+                "error": f"Routers failed to load: {routers_failed[0]}"
             }
         )
+    return {
+        "status": "healthy",
+        "database": "connected"
+    }
 
 
 # Routers
-app.include_router(login_router.router)
-app.include_router(customers.router)
-app.include_router(orders.router)
-app.include_router(admin.router)
-app.include_router(order_temp_router.router)
-app.include_router(users.router)
+if not FAST_START:
+    include_routers([importlib.import_module(name) for name in ROUTER_MODULES])
+
+record("imports", time.perf_counter() - _import_started)
@@ -0,0 +1,54 @@
+"""
+Maintenance commands for the orders table.
+
+Usage:
+    python manage_orders.py partition             # migrate orders to monthly partitions (PostgreSQL)
+    python manage_orders.py ensure-partitions     # create partitions for upcoming months
+    python manage_orders.py archive               # archive months older than ORDERS_HOT_MONTHS
+    python manage_orders.py archive --before 2025-01 --file orders-2024.ndjson.gz
+    python manage_orders.py rollup                # refresh the daily agent rollup now
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from database import engine, statement_timeout
+from utils.partitions import archive_orders, ensure_partitions, migrate_to_partitioned
+from utils.rollups import refresh_agent_rollup
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="OG Soda orders maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("partition", help="Convert orders to a monthly partitioned table")
+    commands.add_parser("ensure-partitions", help="Create partitions for upcoming months")
+
+    archive = commands.add_parser("archive", help="Move closed months out of orders")
+    archive.add_argument("--before", help="First month to keep, YYYY-MM (default: ORDERS_HOT_MONTHS ago)")
+    archive.add_argument("--file", help="Write to this gzip NDJSON file instead of orders_archive")
+
+    commands.add_parser("rollup", help="Refresh agent_daily_rollup up to yesterday")
+
+    args = parser.parse_args()
+
+    if args.command == "partition":
+        copied = migrate_to_partitioned(engine)
+        print(f"Partitioned orders table ({copied} rows copied)")
+    elif args.command == "ensure-partitions":
+        ensure_partitions(engine)
+        print("Partitions are up to date")
+    elif args.command == "archive":
+        before = datetime.strptime(args.before, "%Y-%m").date() if args.before else None
+        moved = archive_orders(engine, before=before, archive_file=args.file)
+        print(f"Archived {moved} orders")
+    elif args.command == "rollup":
+        days = refresh_agent_rollup(engine)
+        print(f"Rolled up {days} days")
+    return 0
+
+
+if __name__ == "__main__":
+    # These can run far longer than any request
+    with statement_timeout(0):
+        sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+One-shot migration of legacy plain-text passwords to bcrypt.
+
+Hashing runs in parallel across a process pool; rows are updated in
+batches, each only if the stored value is unchanged. Hashes with another
+bcrypt cost can't be upgraded without the password; they are upgraded on
+the user's next login.
+
+After this reports 0 remaining legacy rows, set LEGACY_PASSWORDS=0.
+
+Usage:
+    python migrate_passwords.py [--workers 4] [--batch-size 200] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import and_, bindparam, not_, or_, select, update
+
+from database import engine
+from models.user import User
+from utils.hash import BCRYPT_PREFIXES, hash_password
+
+
+def legacy_filter(users):
+    """Stored passwords that are not any bcrypt variant (plain text)"""
+    return not_(or_(*[users.c.password.startswith(prefix) for prefix in BCRYPT_PREFIXES]))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Hash legacy plain-text passwords")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    users = User.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(users.c.id, users.c.password).where(legacy_filter(users))
+        ).all()
+    print(f"{len(rows)} users with legacy plain-text passwords")
+    if args.dry_run or not rows:
+        return 0
+
+    statement = (
+        update(users)
+        .where(and_(users.c.id == bindparam("user_id"), users.c.password == bindparam("old_hash")))
+        .values(password=bindparam("new_hash"))
+    )
+    migrated = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for start in range(0, len(rows), args.batch_size):
+            batch = rows[start:start + args.batch_size]
+            hashes = list(pool.map(hash_password, [row.password.strip() for row in batch]))
+            with engine.begin() as conn:
+                result = conn.execute(statement, [
+                    {"user_id": row.id, "old_hash": row.password, "new_hash": new_hash}
+                    for row, new_hash in zip(batch, hashes)
+                ])
+                migrated += result.rowcount
+            print(f"Migrated {migrated}/{len(rows)}")
+
+    with engine.connect() as conn:
+        remaining = len(conn.execute(select(users.c.id).where(legacy_filter(users))).all())
+    print(f"Done. {remaining} legacy rows remaining")
+    return 0 if remaining == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index
 from sqlalchemy.sql import func
 from database import Base
 
@@ -16,6 +16,25 @@ class Customer(Base):
     longitude = Column(Float, nullable=True)        # NEW FIELD
 
     address = Column(String, nullable=False)
-    pincode = Column(String, nullable=True)
+    pincode = Column(String, nullable=True, index=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # One customer per normalized shop name + phone (duplicate check / upsert target)
+        Index(
+            "uq_customers_shop_phone",
+            func.lower(func.trim(shop_name)),
+            func.trim(phone),
+            unique=True
+        ),
+    )
+
+
+# Created at startup on existing databases (utils.startup.ensure_unique_indexes)
+CUSTOMER_KEY_INDEX = next(i for i in Customer.__table__.indexes if i.name == "uq_customers_shop_phone")
+
+
+def customer_key(shop_name, phone):
+    """Normalized (shop_name, phone) expressions matching uq_customers_shop_phone"""
+    return func.lower(func.trim(shop_name)), func.trim(phone)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import relationship
 from database import Base
 
 
@@ -15,4 +16,30 @@ class Order(Base):
     payment_status = Column(String(50), nullable=True)
     delivered_by = Column(Integer, nullable=True)
     review_status = Column(String(50), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    # Loaded only when asked for (include=customer on order lists)
+    customer = relationship("Customer", lazy="raise_on_sql")
+
+    __table_args__ = (
+        # A customer's latest orders (ORDER BY created_at DESC LIMIT n) and
+        # date-bounded per-customer stats, without scanning all their orders
+        Index("ix_orders_customer_id_created_at", "customer_id", "created_at", "order_id"),
+    )
+
+
+class OrderArchive(Base):
+    """Closed months of order history moved out of the hot orders table"""
+    __tablename__ = "orders_archive"
+
+    order_id = Column(Integer, primary_key=True, autoincrement=False)
+    customer_id = Column(Integer, nullable=True, index=True)
+    trays_holding = Column(Integer, default=0, nullable=False)
+    trays_returned = Column(Integer, default=0, nullable=False)
+    bottles_holding = Column(Integer, default=0, nullable=False)
+    bottles_returned = Column(Integer, default=0, nullable=False)
+    bottles_damaged = Column(Integer, default=0, nullable=False)
+    payment_status = Column(String(50), nullable=True)
+    delivered_by = Column(Integer, nullable=True)
+    review_status = Column(String(50), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
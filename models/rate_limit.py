@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Float, Boolean
+from database import Base
+
+
+class RateLimitBucket(Base):
+    """Token buckets shared across workers (RATE_LIMIT_STORE=table)"""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(255), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # epoch seconds
+    allowed = Column(Boolean, nullable=False, default=True)  # outcome of the last take
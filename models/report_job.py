@@ -0,0 +1,30 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, DateTime, Index, func
+from database import Base
+
+
+class ReportJob(Base):
+    """A queued or finished background report (see utils.jobs)"""
+    __tablename__ = "report_jobs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    params = Column(Text, nullable=False, default="{}")  # JSON
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_report_jobs_status_created_at", "status", "created_at"),
+    )
+
+
+class ReportJobChunk(Base):
+    """One piece of a finished job's JSON result; the pieces joined in seq order are the result"""
+    __tablename__ = "report_job_chunks"
+
+    job_id = Column(String(32), ForeignKey("report_jobs.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    data = Column(Text, nullable=False)
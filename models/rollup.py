@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, func
+from database import Base
+
+
+class AgentDailyRollup(Base):
+    """Per-agent order totals for one closed day (see utils.rollups)"""
+    __tablename__ = "agent_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    agent_id = Column(Integer, primary_key=True, index=True)
+    total_orders = Column(Integer, nullable=False, default=0)
+    total_trays_outside = Column(Integer, nullable=False, default=0)
+    total_trays_received = Column(Integer, nullable=False, default=0)
+    total_bottles_delivered = Column(Integer, nullable=False, default=0)
+    total_bottles_returned = Column(Integer, nullable=False, default=0)
+    total_bottles_damaged = Column(Integer, nullable=False, default=0)
+
+
+class RollupDirtyDay(Base):
+    """Closed day whose orders changed after it was rolled up (see utils.rollups)"""
+    __tablename__ = "rollup_dirty_days"
+
+    day = Column(Date, primary_key=True)
+    # Bumped on every mark, so a refresh only clears marks it has seen
+    version = Column(Integer, nullable=False, default=1)
+
+
+class RollupState(Base):
+    """Range of days a rollup table covers; days outside it are computed live"""
+    __tablename__ = "rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    covered_from = Column(Date, nullable=True)
+    covered_through = Column(Date, nullable=True)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -20,10 +20,14 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=True)
     phone = Column(String(50), unique=True, index=True, nullable=True)
     password = Column(String(255), nullable=False)  # hashed
-    role = Column(Enum(UserRole), default=UserRole.customer, nullable=False)
-    status = Column(String(50), default="active", nullable=False)
+    role = Column(Enum(UserRole), default=UserRole.customer, nullable=False, index=True)
+    status = Column(String(50), default="active", nullable=False, index=True)
     last_login = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True),
                         server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(
     ), onupdate=func.now(), nullable=False)
+
+    # Fetch server-generated updated_at with RETURNING on flush, so responses
+    # don't need a refresh() round trip after commit
+    __mapper_args__ = {"eager_defaults": True}
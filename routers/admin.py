@@ -1,40 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import io
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from database import get_db
+from database import engine, get_read_db, ReadSessionLocal
 from models.customer import Customer
 from models.order import Order
+from schemas.bulk_import import ImportKind, ImportResult
+from utils.bulk_import import DEFAULT_CHUNK_SIZE, detect_format, import_file
+from utils.events import bus, stream_events
+from utils.single_flight import coalescer
+from utils.maintenance import maintenance_status
+from utils.startup import startup_timings
 
 router = APIRouter(prefix="/admin", tags=["Admin Dashboard"])
 
 
+def compute_metrics(db: Session) -> dict:
+    """Total customers, total orders and orders by payment status"""
+    total_customers = db.query(Customer).count()
+    total_orders = db.query(Order).count()
+    
+    # Calculate orders by payment status
+    orders_by_payment = db.query(
+        Order.payment_status,
+        func.count(Order.order_id).label('count')
+    ).group_by(Order.payment_status).all()
+    
+    payment_status_summary = {
+        status: count for status, count in orders_by_payment if status
+    }
+    
+    return {
+        "total_customers": total_customers,
+        "total_orders": total_orders,
+        "payment_status_summary": payment_status_summary
+    }
+
+
 @router.get("/metrics")
-def metrics(db: Session = Depends(get_db)):
+def metrics(db: Session = Depends(get_read_db)):
     """
     Get admin dashboard metrics.
     Returns total counts of customers and orders.
     """
     try:
-        total_customers = db.query(Customer).count()
-        total_orders = db.query(Order).count()
-        
-        # Calculate orders by payment status
-        orders_by_payment = db.query(
-            Order.payment_status,
-            func.count(Order.order_id).label('count')
-        ).group_by(Order.payment_status).all()
-        
-        payment_status_summary = {
-            status: count for status, count in orders_by_payment if status
-        }
-        
-        return {
-            "total_customers": total_customers,
-            "total_orders": total_orders,
-            "payment_status_summary": payment_status_summary
-        }
+        # Concurrent dashboard loads share one set of aggregate queries
+        return coalescer.do(("admin.metrics",), lambda: compute_metrics(db))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching metrics: {str(e)}"
         )
+
+
+@router.get("/maintenance")
+def maintenance():
+    """
+    Outcome of the last background maintenance run
+    (e.g. how many stale order_temp drafts were expired).
+    """
+    return maintenance_status
+
+
+@router.get("/startup")
+def startup():
+    """Startup timing breakdown in milliseconds (imports, schema, routers, first response)"""
+    return startup_timings
+
+
+def _metrics_snapshot() -> dict:
+    db = ReadSessionLocal()
+    try:
+        return coalescer.do(("admin.metrics",), lambda: compute_metrics(db))
+    finally:
+        db.close()
+
+
+@router.get("/stream")
+async def stream(request: Request):
+    """
+    Server-Sent Events stream for the live dashboard.
+    Sends a "metrics.snapshot" event on connect, then incremental events
+    (order.created/updated/deleted, customer.created/deleted) with metric
+    deltas, so the dashboard no longer needs to poll /admin/metrics.
+    """
+    snapshot = await asyncio.to_thread(_metrics_snapshot)
+    queue = bus.subscribe()
+
+    async def event_source():
+        try:
+            async for message in stream_events(
+                queue,
+                request.is_disconnected,
+                first={"type": "metrics.snapshot", "data": snapshot}
+            ):
+                yield message
+        finally:
+            bus.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/import/{kind}", response_model=ImportResult)
+def bulk_import(
+    kind: ImportKind,
+    file: UploadFile = File(..., description="CSV or NDJSON file"),
+    format: Optional[str] = Query(None, description="csv or ndjson (default: from file extension)"),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=50000),
+):
+    """
+    Bulk import customers or historical orders from a CSV/NDJSON file.
+    Rows are validated in chunks, staged and merged in one transaction.
+    Existing customers (same shop name + phone) and already imported orders
+    are skipped. Invalid rows are reported, not imported.
+    """
+    fmt = (format or detect_format(file.filename)).lower()
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return import_file(engine, kind, stream, fmt=fmt, chunk_size=chunk_size)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error importing {kind.value}: {str(e)}"
+        )
+    finally:
+        stream.detach()
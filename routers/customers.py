@@ -1,33 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from database import get_db
-from models.customer import Customer
+from database import get_db, get_read_db, get_readonly_db
+from models.customer import CUSTOMER_KEY_INDEX, Customer, customer_key
 from schemas.customer import CustomerCreate, CustomerResponse
+from schemas.order import CustomerOrderStats, CustomerOverviewResponse
+from utils.events import publish_event
+from utils.fieldsets import FieldSelection, field_selection
+from utils.batch import parse_ids, in_requested_order
+from utils.upsert import dialect_insert
+from utils.startup import missing_unique_indexes
+from utils import hot_queries
+from utils.bulk_delete import count_customer_orders, remove_customer_orders
 
 router = APIRouter(prefix="/customers", tags=["Customers"])
 
 
 @router.post("/", response_model=CustomerResponse)
-def create_customer(data: CustomerCreate, db: Session = Depends(get_db)):
-    """Create a new customer"""
+def create_customer(data: CustomerCreate, response: Response, db: Session = Depends(get_db)):
+    """
+    Create a new customer.
+    Idempotent on the normalized shop name + phone: if that customer already
+    exists, it is returned instead (with header X-Existing-Customer: true).
+    """
     try:
-        # Optional duplicate check (shop name + phone)
-        existing = db.query(Customer).filter(
-            Customer.shop_name == data.shop_name,
-            Customer.phone == data.phone
-        ).first()
-
-        if existing:
-            raise HTTPException(
-                status_code=400,
-                detail="Customer already exists with this phone number"
-            )
+        customers = Customer.__table__
+        same_key = select(*customers.c).where(
+            *[column == value for column, value in zip(
+                customer_key(customers.c.shop_name, customers.c.phone),
+                customer_key(data.shop_name, data.phone)
+            )]
+        ).limit(1)
+
+        if CUSTOMER_KEY_INDEX.name in missing_unique_indexes:
+            # No unique index to conflict on (duplicates not resolved yet,
+            # see ENV_CONFIG.md): check, then insert
+            existing = db.execute(same_key).first()
+            customer = None if existing else db.execute(
+                customers.insert().values(**data.dict()).returning(*customers.c)
+            ).first()
+        else:
+            insert = dialect_insert(db.get_bind().dialect.name)
+            # One indexed statement: insert unless uq_customers_shop_phone conflicts
+            customer = db.execute(
+                insert(customers)
+                .values(**data.dict())
+                .on_conflict_do_nothing(index_elements=list(customer_key(customers.c.shop_name, customers.c.phone)))
+                .returning(*customers.c)
+            ).first()
+            existing = None
+
+        if customer is None:
+            response.headers["X-Existing-Customer"] = "true"
+            return existing or db.execute(same_key).first()
 
-        customer = Customer(**data.dict())
-        db.add(customer)
+        publish_event(
+            db, "customer.created",
+            CustomerResponse.model_validate(customer).model_dump(mode="json"),
+            {"total_customers": 1}
+        )
         db.commit()
-        db.refresh(customer)
         return customer
     except HTTPException:
         raise
@@ -40,30 +75,126 @@ def create_customer(data: CustomerCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[CustomerResponse])
-def list_customers(db: Session = Depends(get_db)):
-    return db.query(Customer).all()
+def list_customers(
+    selection: FieldSelection = Depends(field_selection),
+    db: Session = Depends(get_read_db)
+):
+    query = db.query(Customer)
+    if not selection.is_default:
+        return selection.respond(query, Customer)
+    return query.all()
+
+
+@router.get("/batch", response_model=list[CustomerResponse])
+def get_customers_batch(
+    ids: str = Query(..., description="Comma-separated customer IDs (max 500)"),
+    db: Session = Depends(get_readonly_db)
+):
+    """
+    Get many customers by ID in one query.
+    Customers are returned in the requested order; unknown IDs are skipped.
+    """
+    customer_ids = parse_ids(ids)
+    customers = db.query(Customer).filter(Customer.id.in_(customer_ids)).all()
+    return in_requested_order(customers, customer_ids, key=lambda c: c.id)
 
 
 @router.get("/{customer_id}", response_model=CustomerResponse)
-def get_customer(customer_id: int, db: Session = Depends(get_db)):
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+def get_customer(customer_id: int, db: Session = Depends(get_readonly_db)):
+    customer = hot_queries.get_customer(db, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
 
+@router.get("/{customer_id}/overview", response_model=CustomerOverviewResponse)
+def get_customer_overview(
+    customer_id: int,
+    limit: int = Query(10, ge=1, le=100, description="Number of recent orders"),
+    days: int = Query(90, ge=1, le=366, description="Window for the rolling stats"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Customer detail screen in one call: the customer, its `limit` newest
+    orders and rolling stats over the last `days` days. Both order queries
+    are bounded range scans on ix_orders_customer_id_created_at.
+    """
+    customer = hot_queries.get_customer(db, customer_id)
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    recent_orders = hot_queries.recent_customer_orders(db, customer_id, limit)
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    totals = hot_queries.customer_order_stats(db, customer_id, since)
+
+    return CustomerOverviewResponse(
+        customer=customer,
+        recent_orders=recent_orders,
+        stats=CustomerOrderStats(
+            window_days=days,
+            orders=totals.orders,
+            bottles_delivered=totals.bottles_delivered,
+            bottles_returned=totals.bottles_returned,
+            bottles_damaged=totals.bottles_damaged,
+            avg_bottles_per_order=round(totals.bottles_delivered / totals.orders, 2) if totals.orders else 0.0,
+            damage_rate=round(totals.bottles_damaged / totals.bottles_delivered, 4) if totals.bottles_delivered else 0.0,
+            last_order_at=recent_orders[0].created_at if recent_orders else None,
+        ),
+    )
+
+
 @router.delete("/{customer_id}")
-def delete_customer(customer_id: int, db: Session = Depends(get_db)):
-    """Delete a customer"""
+def delete_customer(
+    customer_id: int,
+    orders: str = Query(
+        "restrict", pattern="^(restrict|archive|cascade)$",
+        description="restrict: refuse if the customer has orders; "
+                    "archive: move its orders to orders_archive; cascade: delete its orders"
+    ),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete a customer.
+    With orders=archive or orders=cascade its orders and temp orders are
+    removed first, in batches committed one at a time (progress is
+    published as "customer.delete_progress" events).
+    """
     try:
         customer = db.query(Customer).filter(Customer.id == customer_id).first()
         if not customer:
             raise HTTPException(status_code=404, detail="Customer not found")
 
+        if orders == "restrict":
+            order_count, temp_order_count = count_customer_orders(db, customer_id)
+            if order_count or temp_order_count:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Customer has {order_count} orders and {temp_order_count} temp orders; "
+                           f"use orders=archive or orders=cascade"
+                )
+            removed = {"orders_removed": 0, "temp_orders_removed": 0, "payment_status": {}}
+        else:
+            removed = remove_customer_orders(
+                db, customer_id, archive=orders == "archive",
+                on_progress=lambda progress: publish_event(db, "customer.delete_progress", progress)
+            )
+
         db.delete(customer)
+        publish_event(
+            db, "customer.deleted", {"id": customer_id},
+            {
+                "total_customers": -1,
+                "total_orders": -removed["orders_removed"],
+                "payment_status": removed["payment_status"],
+            }
+        )
         db.commit()
 
-        return {"message": "Customer deleted successfully"}
+        return {
+            "message": "Customer deleted successfully",
+            f"orders_{'archived' if orders == 'archive' else 'deleted'}": removed["orders_removed"],
+            "temp_orders_deleted": removed["temp_orders_removed"],
+        }
     except HTTPException:
         raise
     except Exception as e:
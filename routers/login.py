@@ -1,29 +1,41 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from datetime import datetime, timezone
-from database import get_db
-from models.user import User
+from database import get_readonly_db
 from schemas.user import LoginRequest, UserOut
-from utils.hash import verify_password
+from utils.hash import verify_password, needs_rehash, hash_password
+from utils.write_behind import last_login_buffer, password_rehash_buffer
+from utils.rate_limit import check_login_rate
+from utils import hot_queries
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def rehash_password(user_id: int, old_hash: str, password: str) -> None:
+    """Hash with the configured cost after the response; stored write-behind"""
+    password_rehash_buffer.record(user_id, (old_hash, hash_password(password)))
+
+
 @router.post("/login", response_model=UserOut)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
+def login(
+    payload: LoginRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_readonly_db)
+):
     try:
         identifier = payload.identifier.strip()
         password = payload.password
 
+        # Shed brute-force attempts before any DB lookup or bcrypt work
+        check_login_rate(request, identifier)
+
         # Try Email or Phone (case-insensitive for email)
         if "@" in identifier:
             # Case-insensitive email matching
-            user = db.query(User).filter(
-                func.lower(User.email) == func.lower(identifier)
-            ).first()
+            user = hot_queries.user_by_email(db, identifier)
         else:
-            user = db.query(User).filter(User.phone == identifier).first()
+            user = hot_queries.user_by_phone(db, identifier)
 
         if not user:
             raise HTTPException(
@@ -54,12 +66,16 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
                 detail="Invalid credentials"
             )
 
-        # Update last_login timestamp
-        user.last_login = datetime.now(timezone.utc)
-        db.commit()
-        db.refresh(user)
+        # Upgrade legacy plain-text or differently-costed hashes off the response
+        if needs_rehash(user.password):
+            background_tasks.add_task(rehash_password, user.id, user.password, password)
+
+        # Record last_login write-behind; it is flushed in batches by the
+        # background task, so the response is built from the loaded row
+        now = datetime.now(timezone.utc)
+        last_login_buffer.record(user.id, now)
 
-        return user
+        return UserOut.model_validate(user).model_copy(update={"last_login": now})
     except HTTPException:
         # Re-raise HTTP exceptions (like Invalid credentials)
         raise
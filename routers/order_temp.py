@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_read_db, get_readonly_db
 from models.order_temp import OrderTemp
-from schemas.order_temp import OrderTempCreate, OrderTempUpdate, OrderTempResponse
+from schemas.order_temp import (
+    OrderTempCreate, OrderTempUpdate, OrderTempBulkPatch, OrderTempBulkDelete, OrderTempResponse,
+)
+from utils.bulk_update import apply_bulk_patch
+from utils.bulk_delete import bulk_delete_conditions, delete_where
 
 router = APIRouter(
     prefix="/order-temp",
@@ -22,17 +26,47 @@ def create_temp_order(data: OrderTempCreate, db: Session = Depends(get_db)):
     order = OrderTemp(**data.dict())
     db.add(order)
     db.commit()
-    db.refresh(order)
     return order
 
 
 @router.get("/", response_model=list[OrderTempResponse])
-def list_temp_orders(db: Session = Depends(get_db)):
+def list_temp_orders(db: Session = Depends(get_read_db)):
     return db.query(OrderTemp).all()
 
 
+@router.patch("/bulk", response_model=list[OrderTempResponse])
+def bulk_update_temp_orders(body: OrderTempBulkPatch, db: Session = Depends(get_db)):
+    """
+    Update many temp orders in one transaction: per-order changes
+    ({"items": [{"id": 1, "changes": {...}}]}) or the same changes for every
+    temp order matching a filter ({"filter": {...}, "changes": {...}}).
+    Returns the updated temp orders; unknown IDs are skipped.
+    """
+    order_temp = OrderTemp.__table__
+    rows, _ = apply_bulk_patch(db, order_temp, order_temp.c.order_id, body)
+    db.commit()
+    return rows
+
+
+@router.delete("/bulk")
+def bulk_delete_temp_orders(body: OrderTempBulkDelete, db: Session = Depends(get_db)):
+    """
+    Delete many temp orders in one statement, by ID list ({"ids": [...]})
+    or filter ({"filter": {...}}). Unknown IDs are skipped.
+    """
+    order_temp = OrderTemp.__table__
+    conditions = bulk_delete_conditions(db, order_temp, order_temp.c.order_id, body)
+    rows = delete_where(db, order_temp, conditions, order_temp.c.order_id)
+    db.commit()
+    return {
+        "message": f"{len(rows)} temp orders deleted",
+        "deleted": len(rows),
+        "order_ids": [row.order_id for row in rows],
+    }
+
+
 @router.get("/{order_id}", response_model=OrderTempResponse)
-def get_temp_order(order_id: int, db: Session = Depends(get_db)):
+def get_temp_order(order_id: int, db: Session = Depends(get_readonly_db)):
     """Get a specific temp order by order_id"""
     order = db.query(OrderTemp).filter(OrderTemp.order_id == order_id).first()
     if not order:
@@ -41,7 +75,7 @@ def get_temp_order(order_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/customer/{id}", response_model=list[OrderTempResponse])
-def get_customer_temp_orders(id: int, db: Session = Depends(get_db)):
+def get_customer_temp_orders(id: int, db: Session = Depends(get_readonly_db)):
     """
     Return all temp orders belonging to a specific customer.
     """
@@ -50,7 +84,7 @@ def get_customer_temp_orders(id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/delivered-by/{delivered_by}", response_model=list[OrderTempResponse])
-def get_temp_orders_by_delivered_by(delivered_by: int, db: Session = Depends(get_db)):
+def get_temp_orders_by_delivered_by(delivered_by: int, db: Session = Depends(get_readonly_db)):
     """
     Return all temp orders delivered by a specific user.
     """
@@ -71,7 +105,6 @@ def update_temp_order(order_id: int, data: OrderTempUpdate, db: Session = Depend
         setattr(order, key, value)
     
     db.commit()
-    db.refresh(order)
     return order
 
 
@@ -1,16 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, cast
-from sqlalchemy.types import Date
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select
 from datetime import datetime, date
+from typing import Optional
 
-from database import get_db
+from database import get_db, get_read_db, get_readonly_db
 from models.order import Order
 from models.user import User, UserRole
-from schemas.order import OrderCreate, OrderUpdate, OrderResponse, OrderSummaryResponse, AgentOrderSummaryResponse
+from schemas.order import (
+    OrderCreate, OrderUpdate, OrderBulkPatch, OrderBulkDelete, OrderResponse, OrderWithCustomerResponse,
+    OrderSummaryResponse, AgentOrderSummaryResponse,
+    AgentLeaderboardEntry, AgentLeaderboardResponse,
+)
+from utils.events import publish_event, payment_status_delta
+from utils.partitions import created_at_range
+from utils.fieldsets import FieldSelection, field_selection
+from utils.batch import parse_ids, in_requested_order
+from utils.bulk_update import apply_bulk_patch, bulk_event_data
+from utils.bulk_delete import bulk_delete_conditions, delete_where
+from utils.single_flight import coalescer
+from utils import hot_queries
+from utils.rollups import AGENT_TOTALS, agent_totals, mark_rollup_dirty
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+INCLUDE_QUERY = Query(
+    None, pattern="^customer$",
+    description="include=customer embeds each order's customer (loaded in the same query)"
+)
+
+
+def _order_list_response(query, selection: FieldSelection, include: Optional[str]):
+    """Shape an order list query according to fields/format/include"""
+    if include == "customer":
+        if not selection.is_default:
+            raise HTTPException(
+                status_code=400,
+                detail="include=customer cannot be combined with fields or format"
+            )
+        orders = query.options(joinedload(Order.customer)).all()
+        return JSONResponse(content=jsonable_encoder(
+            [OrderWithCustomerResponse.model_validate(order) for order in orders]
+        ))
+    if not selection.is_default:
+        return selection.respond(query, Order)
+    return query.all()
+
 
 @router.post("/", response_model=OrderResponse)
 def create_order(data: OrderCreate, db: Session = Depends(get_db)):
@@ -25,8 +62,15 @@ def create_order(data: OrderCreate, db: Session = Depends(get_db)):
 
         order = Order(**data.dict())
         db.add(order)
+        # INSERT ... RETURNING fills order_id and created_at; no refresh needed
+        db.flush()
+
+        publish_event(
+            db, "order.created",
+            OrderResponse.model_validate(order).model_dump(mode="json"),
+            {"total_orders": 1, "payment_status": payment_status_delta(None, order.payment_status)}
+        )
         db.commit()
-        db.refresh(order)
         return order
     except HTTPException:
         raise
@@ -39,46 +83,237 @@ def create_order(data: OrderCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[OrderResponse])
-def list_orders(db: Session = Depends(get_db)):
-    return db.query(Order).all()
+def list_orders(
+    start: Optional[date] = Query(None, description="Only orders created on or after this date"),
+    end: Optional[date] = Query(None, description="Only orders created on or before this date"),
+    selection: FieldSelection = Depends(field_selection),
+    include: Optional[str] = INCLUDE_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    query = db.query(Order).filter(*created_at_range(Order.created_at, start, end))
+    return _order_list_response(query, selection, include)
+
+
+@router.get("/batch", response_model=list[OrderResponse])
+def get_orders_batch(
+    ids: str = Query(..., description="Comma-separated order IDs (max 500)"),
+    include: Optional[str] = INCLUDE_QUERY,
+    db: Session = Depends(get_readonly_db)
+):
+    """
+    Get many orders by ID in one query.
+    Orders are returned in the requested order; unknown IDs are skipped.
+    """
+    order_ids = parse_ids(ids)
+    query = db.query(Order).filter(Order.order_id.in_(order_ids))
+    if include == "customer":
+        query = query.options(joinedload(Order.customer))
+    orders = in_requested_order(query.all(), order_ids, key=lambda o: o.order_id)
+    if include == "customer":
+        return JSONResponse(content=jsonable_encoder(
+            [OrderWithCustomerResponse.model_validate(order) for order in orders]
+        ))
+    return orders
+
+
+@router.patch("/bulk", response_model=list[OrderResponse])
+def bulk_update_orders(body: OrderBulkPatch, db: Session = Depends(get_db)):
+    """
+    Update many orders in one transaction: per-order changes
+    ({"items": [{"id": 1, "changes": {...}}]}) or the same changes for every
+    order matching a filter ({"filter": {...}, "changes": {...}}).
+    Returns the updated orders; unknown IDs are skipped.
+    """
+    orders = Order.__table__
+    try:
+        rows, old_payment_status = apply_bulk_patch(
+            db, orders, orders.c.order_id, body, track="payment_status"
+        )
+        mark_rollup_dirty(db, [row.created_at for row in rows])
+        if rows:
+            payment_status: dict[str, int] = {}
+            for row in rows:
+                if row.order_id in old_payment_status:
+                    for status, change in payment_status_delta(old_payment_status[row.order_id], row.payment_status).items():
+                        payment_status[status] = payment_status.get(status, 0) + change
+            publish_event(
+                db, "orders.bulk_updated", bulk_event_data(body, rows),
+                {"payment_status": {status: change for status, change in payment_status.items() if change}}
+            )
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error updating orders: {str(e)}"
+        )
+    return rows
+
+
+@router.delete("/bulk")
+def bulk_delete_orders(body: OrderBulkDelete, db: Session = Depends(get_db)):
+    """
+    Delete many orders in one statement, by ID list ({"ids": [...]}) or
+    filter ({"filter": {...}}). Unknown IDs are skipped.
+    """
+    orders = Order.__table__
+    conditions = bulk_delete_conditions(db, orders, orders.c.order_id, body)
+    try:
+        rows = delete_where(
+            db, orders, conditions, orders.c.order_id, orders.c.payment_status, orders.c.created_at
+        )
+        mark_rollup_dirty(db, [row.created_at for row in rows])
+        if rows:
+            payment_status: dict[str, int] = {}
+            for row in rows:
+                for status, change in payment_status_delta(row.payment_status, None).items():
+                    payment_status[status] = payment_status.get(status, 0) + change
+            publish_event(
+                db, "orders.bulk_deleted", bulk_event_data(body, rows),
+                {"total_orders": -len(rows), "payment_status": payment_status}
+            )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error deleting orders: {str(e)}"
+        )
+    return {
+        "message": f"{len(rows)} orders deleted",
+        "deleted": len(rows),
+        "order_ids": [row.order_id for row in rows],
+    }
+
+
+LEADERBOARD_SORTS = ["total_orders", *AGENT_TOTALS, "name", "agent_id"]
+
+
+@router.get("/agents/summary", response_model=AgentLeaderboardResponse)
+def get_agents_summary(
+    start: Optional[date] = Query(None, description="First day (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day (inclusive)"),
+    sort: str = Query("total_orders", pattern=f"^({'|'.join(LEADERBOARD_SORTS)})$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Order totals for every agent in one grouped query (agents without orders
+    are listed with zeros). Closed days are read from the daily rollup
+    (utils.rollups), only the rest of the range is aggregated live.
+    Concurrent identical requests share one query (see utils.single_flight).
+    """
+    return coalescer.do(
+        ("orders.agents.summary", start, end, sort, order, limit, offset),
+        lambda: _agents_summary(db, start, end, sort, order, limit, offset)
+    )
+
+
+def _agents_summary(
+    db: Session, start: Optional[date], end: Optional[date],
+    sort: str, order: str, limit: int, offset: int
+) -> AgentLeaderboardResponse:
+    totals, source = agent_totals(db.connection(), start, end)
+    # Agents without orders in the range get zeros
+    columns = {
+        "agent_id": User.id.label("agent_id"),
+        "name": User.name,
+        **{
+            name: func.coalesce(totals.c[name], 0).label(name)
+            for name in ["total_orders", *AGENT_TOTALS]
+        },
+    }
+    sort_column = columns[sort]
+    query = (
+        select(*columns.values())
+        .outerjoin(totals, totals.c.agent_id == User.id)
+        .where(User.role == UserRole.agent)
+        .order_by(sort_column.desc() if order == "desc" else sort_column.asc(), User.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    rows = db.execute(query).all()
+    total = db.query(func.count(User.id)).filter(User.role == UserRole.agent).scalar()
+
+    return AgentLeaderboardResponse(
+        items=[AgentLeaderboardEntry(**row._mapping) for row in rows],
+        total=total,
+        limit=limit,
+        offset=offset,
+        source=source,
+    )
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
-def get_order(order_id: int, db: Session = Depends(get_db)):
+def get_order(order_id: int, db: Session = Depends(get_readonly_db)):
     """Get a specific order by order_id"""
-    order = db.query(Order).filter(Order.order_id == order_id).first()
+    order = hot_queries.get_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
 
 @router.get("/customer/{id}", response_model=list[OrderResponse])
-def get_customer_orders(id: int, db: Session = Depends(get_db)):
+def get_customer_orders(
+    id: int,
+    start: Optional[date] = Query(None, description="Only orders created on or after this date"),
+    end: Optional[date] = Query(None, description="Only orders created on or before this date"),
+    selection: FieldSelection = Depends(field_selection),
+    include: Optional[str] = INCLUDE_QUERY,
+    db: Session = Depends(get_readonly_db)
+):
     """
     Return all orders belonging to a specific customer.
+    Optional start/end dates limit the scan to those months' partitions.
     """
-    orders = db.query(Order).filter(Order.customer_id == id).all()
-    return orders
+    query = db.query(Order).filter(
+        Order.customer_id == id,
+        *created_at_range(Order.created_at, start, end)
+    )
+    return _order_list_response(query, selection, include)
 
 
 @router.get("/delivered-by/{delivered_by}", response_model=list[OrderResponse])
-def get_orders_by_delivered_by(delivered_by: int, db: Session = Depends(get_db)):
+def get_orders_by_delivered_by(
+    delivered_by: int,
+    start: Optional[date] = Query(None, description="Only orders created on or after this date"),
+    end: Optional[date] = Query(None, description="Only orders created on or before this date"),
+    selection: FieldSelection = Depends(field_selection),
+    include: Optional[str] = INCLUDE_QUERY,
+    db: Session = Depends(get_readonly_db)
+):
     """
     Return all orders delivered by a specific user.
+    Optional start/end dates limit the scan to those months' partitions.
     """
-    orders = db.query(Order).filter(Order.delivered_by == delivered_by).all()
-    return orders
+    query = db.query(Order).filter(
+        Order.delivered_by == delivered_by,
+        *created_at_range(Order.created_at, start, end)
+    )
+    return _order_list_response(query, selection, include)
 
 
 @router.get("/agent/{user_id}/summary", response_model=AgentOrderSummaryResponse)
-def get_agent_order_summary(user_id: int, db: Session = Depends(get_db)):
+def get_agent_order_summary(user_id: int, db: Session = Depends(get_read_db)):
     """
     Get aggregated order statistics for a specific agent.
     Validates that the user exists and has role "agent".
     Returns sums of all order fields where delivered_by matches the user_id.
+    Concurrent identical requests share one query (see utils.single_flight).
     """
+    return coalescer.do(
+        ("orders.agent_summary", user_id),
+        lambda: _agent_order_summary(db, user_id)
+    )
+
+
+def _agent_order_summary(db: Session, user_id: int) -> AgentOrderSummaryResponse:
     # Validate user exists and is an agent
-    user = db.query(User).filter(User.id == user_id).first()
+    user = hot_queries.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -88,18 +323,8 @@ def get_agent_order_summary(user_id: int, db: Session = Depends(get_db)):
             detail=f"User with ID {user_id} is not an agent. Current role: {user.role.value}"
         )
     
-    # Filter orders by delivered_by
-    orders_query = db.query(Order).filter(Order.delivered_by == user_id)
-    
-    # Aggregate the data
-    result = orders_query.with_entities(
-        func.count(Order.order_id).label('total_orders'),
-        func.coalesce(func.sum(Order.trays_holding), 0).label('total_trays_outside'),
-        func.coalesce(func.sum(Order.trays_returned), 0).label('total_trays_received'),
-        func.coalesce(func.sum(Order.bottles_holding), 0).label('total_bottles_delivered'),
-        func.coalesce(func.sum(Order.bottles_returned), 0).label('total_bottles_returned'),
-        func.coalesce(func.sum(Order.bottles_damaged), 0).label('total_bottles_damaged')
-    ).first()
+    # Aggregate the agent's orders (precompiled, see utils.hot_queries)
+    result = hot_queries.agent_order_totals(db, user_id)
     
     if not result or result.total_orders == 0:
         # Return zeros if no orders found for the agent
@@ -125,18 +350,26 @@ def get_agent_order_summary(user_id: int, db: Session = Depends(get_db)):
 @router.get("/summary/by-date", response_model=OrderSummaryResponse)
 def get_orders_summary_by_date(
     timestamp: datetime = Query(..., description="Timestamp/date to filter orders (format: YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get aggregated order statistics for a specific date.
     Returns total orders count and sums of trays and bottles fields.
+    Concurrent identical requests share one query (see utils.single_flight).
     """
     # Extract date from timestamp
     target_date = timestamp.date()
     
-    # Filter orders by date (compare only the date part, ignoring time)
+    return coalescer.do(
+        ("orders.summary.by_date", target_date),
+        lambda: _orders_summary_for_date(db, target_date)
+    )
+
+
+def _orders_summary_for_date(db: Session, target_date: date) -> OrderSummaryResponse:
+    # Filter orders by date as a created_at range (index and partition friendly)
     orders_query = db.query(Order).filter(
-        cast(Order.created_at, Date) == target_date
+        *created_at_range(Order.created_at, target_date, target_date)
     )
     
     # Aggregate the data
@@ -177,13 +410,20 @@ def update_order(order_id: int, data: OrderUpdate, db: Session = Depends(get_db)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    old_payment_status = order.payment_status
+
     # Update fields (only provided fields)
     update_data = data.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(order, key, value)
-    
+    mark_rollup_dirty(db, [order.created_at])
+
+    publish_event(
+        db, "order.updated",
+        OrderResponse.model_validate(order).model_dump(mode="json"),
+        {"payment_status": payment_status_delta(old_payment_status, order.payment_status)}
+    )
     db.commit()
-    db.refresh(order)
     return order
 
 
@@ -194,6 +434,14 @@ def delete_order(order_id: int, db: Session = Depends(get_db)):
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    payment_status = order.payment_status
     db.delete(order)
+    mark_rollup_dirty(db, [order.created_at])
+
+    publish_event(
+        db, "order.deleted",
+        {"order_id": order_id},
+        {"total_orders": -1, "payment_status": payment_status_delta(payment_status, None)}
+    )
     db.commit()
     return {"message": "Order deleted successfully"}
\ No newline at end of file
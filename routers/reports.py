@@ -0,0 +1,87 @@
+import json
+import uuid
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import engine, get_db, get_read_db, get_readonly_db
+from models.report_job import ReportJob, ReportJobChunk
+from schemas.report import ReportKind, ReportJobResponse, PincodeSummary
+from utils.jobs import dispatch
+from utils.reports import by_pincode
+from utils.single_flight import coalescer
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+@router.post("/{kind}", response_model=ReportJobResponse, status_code=202)
+def create_report(
+    kind: ReportKind,
+    start: Optional[date] = Query(None, description="First day (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day (inclusive)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a report and return its job right away.
+    Poll GET /reports/{id} until status is "done" (or "failed").
+    """
+    params = {"start": start.isoformat() if start else None, "end": end.isoformat() if end else None}
+    job = ReportJob(id=uuid.uuid4().hex, kind=kind.value, params=json.dumps(params), status="queued")
+    db.add(job)
+    db.commit()
+
+    dispatch(engine, job.id)
+    return job
+
+
+@router.get("/by-pincode", response_model=list[PincodeSummary])
+def get_pincode_report(
+    start: Optional[date] = Query(None, description="First day (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day (inclusive)"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Per-pincode customer counts, order totals and outstanding trays and
+    bottles for distribution planning. Orders are limited to start..end;
+    every customer is counted. Concurrent identical requests share one query.
+    """
+    params = {"start": start.isoformat() if start else None, "end": end.isoformat() if end else None}
+    return coalescer.do(
+        ("reports.by_pincode", start, end),
+        lambda: by_pincode(db.connection(), params)
+    )
+
+
+def _stream_result(job_id: str, envelope: str):
+    """The job's JSON envelope with its stored result appended one chunk at a time"""
+    yield envelope[:-1] + ', "result": '
+    chunks = ReportJobChunk.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(chunks.c.data)
+            .where(chunks.c.job_id == job_id)
+            .order_by(chunks.c.seq)
+            .execution_options(yield_per=1)
+        )
+        for (data,) in rows:
+            yield data
+    yield "}"
+
+
+@router.get("/{job_id}", response_model=ReportJobResponse)
+def get_report(job_id: str, db: Session = Depends(get_readonly_db)):
+    """
+    Status of a report job. Once it is done the response also contains
+    the report under "result", streamed.
+    """
+    # From the primary: a job created moments ago may not be on the replica yet
+    job = db.query(ReportJob).filter(ReportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+
+    if job.status != "done":
+        return job
+    envelope = ReportJobResponse.model_validate(job).model_dump_json()
+    return StreamingResponse(_stream_result(job.id, envelope), media_type="application/json")
@@ -1,23 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from database import get_db
+from database import get_db, get_read_db, get_readonly_db
 from models.user import User, UserRole
-from schemas.user import UserCreate, UserOut, UserPasswordResponse
+from schemas.user import UserCreate, UserUpdate, UserOut, UserOption, UserPasswordResponse
 from utils.hash import hash_password
+from utils.batch import parse_ids, in_requested_order
+from utils.cache import user_options_cache
+from utils.events import bus, publish_event
 from typing import List, Optional
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# User writes (on any worker) drop the cached option lists
+bus.add_handler(user_options_cache.invalidate_on("user."))
+
+
+def _parse_role(role: str) -> str:
+    """Normalize and validate a role path parameter against the enum"""
+    role_value = role.strip().lower()
+    valid_roles = {r.value for r in UserRole}
+    if role_value not in valid_roles:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid role. Allowed: {', '.join(sorted(valid_roles))}"
+        )
+    return role_value
+
 
 @router.get("/", response_model=List[UserOut])
-def list_users(db: Session = Depends(get_db)):
+def list_users(db: Session = Depends(get_read_db)):
     """List all users (for debugging)"""
     return db.query(User).all()
 
 
+@router.get("/batch", response_model=List[UserOut])
+def get_users_batch(
+    ids: str = Query(..., description="Comma-separated user IDs (max 500)"),
+    db: Session = Depends(get_readonly_db)
+):
+    """
+    Get many users by ID in one query.
+    Users are returned in the requested order; unknown IDs are skipped.
+    """
+    user_ids = parse_ids(ids)
+    users = db.query(User).filter(User.id.in_(user_ids)).all()
+    return in_requested_order(users, user_ids, key=lambda u: u.id)
+
+
 @router.get("/exclude-poweradmin", response_model=List[UserOut])
-def list_users_exclude_poweradmin(db: Session = Depends(get_db)):
+def list_users_exclude_poweradmin(db: Session = Depends(get_read_db)):
     """
     Return all users except those with the role "poweradmin".
     """
@@ -26,30 +58,46 @@ def list_users_exclude_poweradmin(db: Session = Depends(get_db)):
 
 
 @router.get("/role/{role}", response_model=List[UserOut])
-def list_users_by_role(role: str, db: Session = Depends(get_db)):
+def list_users_by_role(role: str, db: Session = Depends(get_read_db)):
     """
     Return all users filtered by role.
     """
-    # Normalize and validate role against enum
-    role_value = role.strip().lower()
-    valid_roles = {r.value for r in UserRole}
-    if role_value not in valid_roles:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid role. Allowed: {', '.join(sorted(valid_roles))}"
-        )
+    role_value = _parse_role(role)
 
     # Compare directly against the enum value (no LOWER() casting on DB enum)
     users = db.query(User).filter(User.role == role_value).all()
     return users
 
 
+@router.get("/role/{role}/options", response_model=List[UserOption])
+def list_user_options_by_role(
+    role: str,
+    include_inactive: bool = Query(False, description="Also list users whose status is not active"),
+    db: Session = Depends(get_readonly_db)
+):
+    """
+    Compact id + name list of users with a role (e.g. the agent picker).
+    Served from an in-memory cache that user creation and updates invalidate.
+    The cache is refilled from the primary: a lagging replica right after
+    an invalidation would otherwise be cached until the next user write.
+    """
+    role_value = _parse_role(role)
+
+    def load() -> list[dict]:
+        query = db.query(User.id, User.name).filter(User.role == role_value)
+        if not include_inactive:
+            query = query.filter(User.status == "active")
+        return [{"id": user_id, "name": name} for user_id, name in query.order_by(User.name, User.id)]
+
+    return user_options_cache.get_or_compute(("role", role_value, include_inactive), load)
+
+
 @router.get("/password-hash", response_model=UserPasswordResponse)
 def get_user_password_hash(
     user_id: Optional[int] = Query(None, description="User ID"),
     username: Optional[str] = Query(None, description="Username (name)"),
     email: Optional[str] = Query(None, description="User email"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_readonly_db)
 ):
     """
     Get the password hash for a user by user_id, username, or email.
@@ -125,8 +173,11 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db)):
         )
 
         db.add(new_user)
+        db.flush()
+        publish_event(db, "user.created", {"id": new_user.id, "role": new_user.role.value})
         db.commit()
-        db.refresh(new_user)
+
+        user_options_cache.invalidate()  # this worker; others via the event
         return new_user
     except HTTPException:
         raise
@@ -136,3 +187,53 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db)):
             status_code=500,
             detail=f"Error creating user: {str(e)}"
         )
+
+
+@router.put("/{user_id}", response_model=UserOut)
+def update_user(user_id: int, payload: UserUpdate, db: Session = Depends(get_db)):
+    """Update an existing user (only provided fields)"""
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        update_data = payload.dict(exclude_unset=True)
+
+        # Email/phone must stay unique (case-insensitive for email)
+        if update_data.get("email"):
+            existing_user = db.query(User).filter(
+                func.lower(User.email) == func.lower(update_data["email"]),
+                User.id != user_id
+            ).first()
+            if existing_user:
+                raise HTTPException(status_code=400, detail="Email already used")
+
+        if update_data.get("phone"):
+            existing_user = db.query(User).filter(
+                User.phone == update_data["phone"],
+                User.id != user_id
+            ).first()
+            if existing_user:
+                raise HTTPException(status_code=400, detail="Phone already used")
+
+        if update_data.get("password"):
+            update_data["password"] = hash_password(update_data["password"])
+        elif "password" in update_data:
+            del update_data["password"]
+
+        for key, value in update_data.items():
+            setattr(user, key, value)
+
+        publish_event(db, "user.updated", {"id": user.id, "role": user.role.value})
+        db.commit()
+
+        user_options_cache.invalidate()  # this worker; others via the event
+        return user
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error updating user: {str(e)}"
+        )
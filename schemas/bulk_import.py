@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from datetime import datetime
+from enum import Enum
+from typing import Any, Optional
+
+from schemas.order import OrderCreate
+
+
+class ImportKind(str, Enum):
+    customers = "customers"
+    orders = "orders"
+
+
+class OrderImportRow(OrderCreate):
+    """
+    One row of historical order data.
+    The customer can be given by customer_id, or by shop_name + phone
+    which are resolved against the customers table during the merge.
+    """
+    created_at: Optional[datetime] = None
+    shop_name: Optional[str] = None
+    phone: Optional[str] = None
+
+
+class ImportRowError(BaseModel):
+    line: int
+    errors: list[Any]
+
+
+class ImportResult(BaseModel):
+    kind: ImportKind
+    rows_read: int
+    rows_valid: int
+    rows_invalid: int
+    inserted: int
+    duplicates: int
+    unresolved: int = 0
+    unknown_customers: int = 0
+    errors: list[ImportRowError] = []
@@ -1,7 +1,9 @@
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
+from schemas.customer import CustomerResponse
+
 
 class OrderBase(BaseModel):
     customer_id: Optional[int] = None
@@ -31,6 +33,33 @@ class OrderUpdate(BaseModel):
     review_status: Optional[str] = None
 
 
+class OrderBulkItem(BaseModel):
+    id: int
+    changes: OrderUpdate
+
+
+class OrderBulkFilter(BaseModel):
+    customer_id: Optional[int] = None
+    delivered_by: Optional[int] = None
+    payment_status: Optional[str] = None
+    review_status: Optional[str] = None
+    start: Optional[date] = None  # created_at, inclusive
+    end: Optional[date] = None
+
+
+class OrderBulkPatch(BaseModel):
+    """Either items, or filter + changes applied to every matching row"""
+    items: Optional[list[OrderBulkItem]] = None
+    filter: Optional[OrderBulkFilter] = None
+    changes: Optional[OrderUpdate] = None
+
+
+class OrderBulkDelete(BaseModel):
+    """Either ids or a filter"""
+    ids: Optional[list[int]] = None
+    filter: Optional[OrderBulkFilter] = None
+
+
 class OrderResponse(OrderBase):
     order_id: int
     created_at: datetime
@@ -40,6 +69,10 @@ class OrderResponse(OrderBase):
     }
 
 
+class OrderWithCustomerResponse(OrderResponse):
+    customer: Optional[CustomerResponse] = None
+
+
 class OrderSummaryResponse(BaseModel):
     total_orders: int
     total_trays_outside: int
@@ -56,3 +89,34 @@ class AgentOrderSummaryResponse(BaseModel):
     total_bottles_delivered: int
     total_bottles_returned: int
     total_bottles_damaged: int
+
+
+class CustomerOrderStats(BaseModel):
+    """Rolling stats over the customer's orders of the last `window_days` days"""
+    window_days: int
+    orders: int
+    bottles_delivered: int
+    bottles_returned: int
+    bottles_damaged: int
+    avg_bottles_per_order: float
+    damage_rate: float  # bottles_damaged / bottles_delivered
+    last_order_at: Optional[datetime] = None  # latest order, in or before the window
+
+
+class CustomerOverviewResponse(BaseModel):
+    customer: CustomerResponse
+    recent_orders: list[OrderResponse]  # newest first
+    stats: CustomerOrderStats
+
+
+class AgentLeaderboardEntry(AgentOrderSummaryResponse):
+    agent_id: int
+    name: str
+
+
+class AgentLeaderboardResponse(BaseModel):
+    items: list[AgentLeaderboardEntry]
+    total: int
+    limit: int
+    offset: int
+    source: str  # "live", "rollup" or "rollup+live"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 
@@ -31,6 +31,33 @@ class OrderTempUpdate(BaseModel):
     review_status: Optional[str] = None
 
 
+class OrderTempBulkItem(BaseModel):
+    id: int
+    changes: OrderTempUpdate
+
+
+class OrderTempBulkFilter(BaseModel):
+    customer_id: Optional[int] = None
+    delivered_by: Optional[int] = None
+    payment_status: Optional[str] = None
+    review_status: Optional[str] = None
+    start: Optional[date] = None  # created_at, inclusive
+    end: Optional[date] = None
+
+
+class OrderTempBulkPatch(BaseModel):
+    """Either items, or filter + changes applied to every matching row"""
+    items: Optional[list[OrderTempBulkItem]] = None
+    filter: Optional[OrderTempBulkFilter] = None
+    changes: Optional[OrderTempUpdate] = None
+
+
+class OrderTempBulkDelete(BaseModel):
+    """Either ids or a filter"""
+    ids: Optional[list[int]] = None
+    filter: Optional[OrderTempBulkFilter] = None
+
+
 class OrderTempResponse(OrderTempBase):
     order_id: int
     created_at: datetime
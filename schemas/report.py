@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+
+class ReportKind(str, Enum):
+    orders_summary = "orders-summary"
+    customer_balances = "customer-balances"
+    agents = "agents"
+    orders_export = "orders-export"
+    by_pincode = "by-pincode"
+
+
+class ReportJobResponse(BaseModel):
+    id: str
+    kind: ReportKind
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
+class PincodeSummary(BaseModel):
+    pincode: Optional[str] = None
+    customers: int
+    total_orders: int
+    total_trays_outside: int
+    total_trays_received: int
+    total_bottles_delivered: int
+    total_bottles_returned: int
+    total_bottles_damaged: int
+    outstanding_trays: int  # trays outside - trays received
+    outstanding_bottles: int  # bottles delivered - bottles returned
@@ -45,6 +45,16 @@ class UserOut(BaseModel):
     }
 
 
+class UserOption(BaseModel):
+    """Compact user entry for pickers"""
+    id: int
+    name: str
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
 class LoginRequest(BaseModel):
     identifier: str = Field(..., description="email or phone")
     password: str
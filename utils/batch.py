@@ -0,0 +1,31 @@
+"""
+Helpers for batch endpoints that resolve many IDs in one IN query.
+"""
+
+from typing import Callable, Iterable, TypeVar
+
+from fastapi import HTTPException
+
+MAX_BATCH_IDS = 500
+
+T = TypeVar("T")
+
+
+def parse_ids(ids: str, limit: int = MAX_BATCH_IDS) -> list[int]:
+    """Parse "1,2,3" into unique integer IDs, keeping the given order"""
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    unique = list(dict.fromkeys(parsed))
+    if not unique:
+        raise HTTPException(status_code=400, detail="At least one id must be provided")
+    if len(unique) > limit:
+        raise HTTPException(status_code=400, detail=f"At most {limit} ids per request")
+    return unique
+
+
+def in_requested_order(rows: Iterable[T], ids: list[int], key: Callable[[T], int]) -> list[T]:
+    """Return rows in the order their IDs were requested; missing IDs are skipped"""
+    by_id = {key(row): row for row in rows}
+    return [by_id[i] for i in ids if i in by_id]
@@ -0,0 +1,136 @@
+"""
+Set-based deletes.
+
+- DELETE /orders/bulk and /order-temp/bulk remove rows by ID list or
+  filter with one DELETE ... RETURNING. A filter may match at most
+  BULK_FILTER_MAX_ROWS rows.
+- DELETE /customers/{id}?orders=archive|cascade removes a customer
+  together with its orders: orders are moved to orders_archive (archive)
+  or deleted (cascade), and temp orders deleted, in batches of
+  DELETE_BATCH_SIZE rows. Each batch is committed on its own so large
+  removals never hold long locks, and progress is logged and published
+  as "customer.delete_progress" dashboard events.
+"""
+
+import logging
+import os
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import Table, delete, func, insert, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from models.order import Order, OrderArchive
+from models.order_temp import OrderTemp
+from utils.batch import MAX_BATCH_IDS
+from utils.bulk_update import check_filter_size, filter_conditions
+from utils.events import payment_status_delta
+from utils.rollups import mark_rollup_dirty
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "1000"))
+
+
+def bulk_delete_conditions(db: Session, table: Table, pk, body: BaseModel) -> list:
+    """WHERE conditions for a bulk delete body: either ids or filter"""
+    if (body.ids is None) == (body.filter is None):
+        raise HTTPException(status_code=400, detail="Send either ids or filter")
+    if body.filter is not None:
+        conditions = filter_conditions(table, body.filter)
+        check_filter_size(db, table, conditions)
+        return conditions
+    ids = list(dict.fromkeys(body.ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="At least one id must be provided")
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return [pk.in_(ids)]
+
+
+def delete_where(db: Session, table: Table, conditions: list, *returning) -> list[Row]:
+    """DELETE FROM table WHERE conditions RETURNING the given columns (not committed)"""
+    return db.execute(delete(table).where(*conditions).returning(*returning)).all()
+
+
+def _remove_orders_batch(db: Session, customer_id: int, archive: bool, batch_size: int) -> list[Row]:
+    orders = Order.__table__
+    rows = db.execute(
+        select(orders)
+        .where(orders.c.customer_id == customer_id)
+        .order_by(orders.c.order_id)
+        .limit(batch_size)
+        .with_for_update()
+    ).all()
+    if not rows:
+        return rows
+    if archive:
+        db.execute(insert(OrderArchive.__table__), [dict(row._mapping) for row in rows])
+    db.execute(delete(orders).where(orders.c.order_id.in_([row.order_id for row in rows])))
+    return rows
+
+
+def _delete_temp_orders_batch(db: Session, customer_id: int, batch_size: int) -> int:
+    order_temp = OrderTemp.__table__
+    batch = (
+        select(order_temp.c.order_id)
+        .where(order_temp.c.customer_id == customer_id)
+        .order_by(order_temp.c.order_id)
+        .limit(batch_size)
+        .with_for_update()
+    )
+    return db.execute(delete(order_temp).where(order_temp.c.order_id.in_(batch))).rowcount
+
+
+def count_customer_orders(db: Session, customer_id: int) -> tuple[int, int]:
+    """(orders, temp orders) referencing the customer"""
+    orders = db.execute(select(func.count()).where(Order.customer_id == customer_id)).scalar()
+    temp_orders = db.execute(select(func.count()).where(OrderTemp.customer_id == customer_id)).scalar()
+    return orders, temp_orders
+
+
+def remove_customer_orders(
+    db: Session,
+    customer_id: int,
+    archive: bool,
+    batch_size: int = DELETE_BATCH_SIZE,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Archive or delete every order and temp order of a customer, committing
+    after each batch. `on_progress` is called (before each commit) with the
+    running counts. Returns the final counts and the payment status deltas.
+    """
+    total_orders, total_temp_orders = count_customer_orders(db, customer_id)
+    progress = {
+        "customer_id": customer_id,
+        "orders_total": total_orders,
+        "orders_removed": 0,
+        "temp_orders_total": total_temp_orders,
+        "temp_orders_removed": 0,
+    }
+    payment_status: dict[str, int] = {}
+
+    while True:
+        rows = _remove_orders_batch(db, customer_id, archive, batch_size)
+        removed_temp = _delete_temp_orders_batch(db, customer_id, batch_size)
+        if not rows and not removed_temp:
+            break
+        progress["orders_removed"] += len(rows)
+        progress["temp_orders_removed"] += removed_temp
+        for row in rows:
+            for status, change in payment_status_delta(row.payment_status, None).items():
+                payment_status[status] = payment_status.get(status, 0) + change
+        mark_rollup_dirty(db, [row.created_at for row in rows])
+        if on_progress:
+            on_progress(dict(progress))
+        db.commit()
+        logger.info(
+            "Removing customer %s: %d/%d orders, %d/%d temp orders",
+            customer_id, progress["orders_removed"], total_orders,
+            progress["temp_orders_removed"], total_temp_orders,
+        )
+
+    return {**progress, "payment_status": payment_status}
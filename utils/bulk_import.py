@@ -0,0 +1,379 @@
+"""
+Bulk import of customers and historical orders.
+
+Files (CSV or NDJSON) are streamed and validated in chunks with the
+Pydantic schemas, loaded into a temporary staging table, then merged into
+customers/orders with a single set-based INSERT ... SELECT that skips
+duplicates.
+
+- PostgreSQL: chunks are loaded with COPY FROM STDIN (psycopg2 or psycopg 3)
+- SQLite (and other dialects): chunks are loaded with batched executemany
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy import (
+    Column, DateTime, Float, Index, Integer, MetaData, String, Table,
+    and_, exists, func, insert, select,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from models.customer import Customer, customer_key
+from models.order import Order
+from schemas.bulk_import import ImportKind, ImportResult, ImportRowError, OrderImportRow
+from schemas.customer import CustomerCreate
+from utils.rollups import day_of, mark_rollup_dirty
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+
+CUSTOMER_COLUMNS = list(CustomerCreate.model_fields)
+ORDER_COLUMNS = [
+    f for f in OrderImportRow.model_fields if f not in ("shop_name", "phone")
+]
+
+# Staging tables live in their own MetaData so create_all never touches them
+_staging_metadata = MetaData()
+
+customers_staging = Table(
+    "customers_staging", _staging_metadata,
+    Column("line_no", Integer, nullable=False),
+    Column("shop_name", String),
+    Column("owner_name", String),
+    Column("phone", String),
+    Column("phone2", String),
+    Column("address", String),
+    Column("pincode", String),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    prefixes=["TEMPORARY"],
+)
+
+orders_staging = Table(
+    "orders_staging", _staging_metadata,
+    Column("line_no", Integer, nullable=False),
+    Column("customer_id", Integer),
+    Column("shop_name", String),
+    Column("phone", String),
+    Column("trays_holding", Integer),
+    Column("trays_returned", Integer),
+    Column("bottles_holding", Integer),
+    Column("bottles_returned", Integer),
+    Column("bottles_damaged", Integer),
+    Column("payment_status", String(50)),
+    Column("delivered_by", Integer),
+    Column("review_status", String(50)),
+    Column("created_at", DateTime(timezone=True)),
+    Index("ix_orders_staging_key", "customer_id", "created_at"),
+    prefixes=["TEMPORARY"],
+)
+
+# Same normalization as uq_customers_shop_phone
+Index(
+    "ix_customers_staging_key",
+    *customer_key(customers_staging.c.shop_name, customers_staging.c.phone)
+)
+
+
+# -----------------------------
+# READING + VALIDATION
+# -----------------------------
+
+def detect_format(filename: str | None) -> str:
+    """Guess the file format from its extension (defaults to csv)"""
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def iter_records(stream: TextIO, fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    Yield (line_number, record, parse_error) for each row of the file.
+    The file is read lazily so large imports never sit fully in memory.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # Empty CSV cells mean "not provided"
+            record = {
+                (key or "").strip(): (value if value != "" else None)
+                for key, value in row.items()
+            }
+            yield reader.line_num, record, None
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"Invalid JSON: {e.msg}"
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# -----------------------------
+# STAGING LOAD
+# -----------------------------
+
+def _copy_value(value) -> str:
+    """Encode one value for COPY ... FROM STDIN (text format)"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _load_staging(conn: Connection, staging: Table, rows: list[dict]) -> None:
+    """Load one validated chunk into the staging table"""
+    if not rows:
+        return
+
+    if conn.dialect.name == "postgresql":
+        columns = [c.name for c in staging.columns]
+        copy_sql = f"COPY {staging.name} ({', '.join(columns)}) FROM STDIN"
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            if conn.dialect.driver == "psycopg":
+                # psycopg 3 adapts the values itself
+                with cursor.copy(copy_sql) as copy:
+                    for row in rows:
+                        copy.write_row([row.get(c) for c in columns])
+            else:
+                buffer = io.StringIO()
+                for row in rows:
+                    buffer.write("\t".join(_copy_value(row.get(c)) for c in columns))
+                    buffer.write("\n")
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+        finally:
+            cursor.close()
+    else:
+        # Batched executemany fallback
+        conn.execute(insert(staging), rows)
+
+
+# -----------------------------
+# MERGE
+# -----------------------------
+
+def _merge_customers(conn: Connection) -> int:
+    """Insert staged customers not already present (normalized shop_name + phone)"""
+    s = customers_staging.alias("s")
+    earlier = customers_staging.alias("d")
+    existing = Customer.__table__
+
+    def same_customer(other):
+        return and_(*[
+            a == b for a, b in zip(
+                customer_key(other.c.shop_name, other.c.phone),
+                customer_key(s.c.shop_name, s.c.phone),
+            )
+        ])
+
+    new_rows = select(*[s.c[name] for name in CUSTOMER_COLUMNS]).where(
+        ~exists().where(same_customer(existing)),
+        # Keep only the first occurrence of a duplicate within the file
+        ~exists().where(and_(same_customer(earlier), earlier.c.line_no < s.c.line_no)),
+    )
+    result = conn.execute(
+        insert(existing).from_select(CUSTOMER_COLUMNS, new_rows)
+    )
+    return result.rowcount
+
+
+def _unknown_customer(staged):
+    """Staged orders whose customer_id is not in customers (they would fail the FK)"""
+    customers = Customer.__table__
+    return and_(
+        staged.c.customer_id.is_not(None),
+        ~exists().where(customers.c.id == staged.c.customer_id),
+    )
+
+
+def _unknown_customer_rows(conn: Connection, limit: int) -> tuple[int, list[ImportRowError]]:
+    """Count staged orders with an unknown customer_id; errors for the first `limit`"""
+    unknown = _unknown_customer(orders_staging)
+    count = conn.execute(
+        select(func.count()).select_from(orders_staging).where(unknown)
+    ).scalar_one()
+    rows = conn.execute(
+        select(orders_staging.c.line_no, orders_staging.c.customer_id)
+        .where(unknown)
+        .order_by(orders_staging.c.line_no)
+        .limit(limit)
+    ) if count and limit > 0 else []
+    return count, [
+        ImportRowError(line=line_no, errors=[{
+            "type": "unknown_customer",
+            "loc": ["customer_id"],
+            "msg": f"Customer {customer_id} not found",
+        }])
+        for line_no, customer_id in rows
+    ]
+
+
+def _merge_orders(conn: Connection) -> tuple[int, int]:
+    """
+    Insert staged orders, resolving shop_name + phone to customer_id.
+    Rows identical to an existing order (same customer, timestamp, agent and
+    quantities) are treated as duplicates, and rows with an unknown
+    customer_id are skipped. Returns (inserted, unresolved).
+    """
+    s = orders_staging.alias("s")
+    earlier = orders_staging.alias("d")
+    existing = Order.__table__
+    customers = Customer.__table__
+
+    def resolved_customer(staged):
+        lookup = (
+            select(customers.c.id)
+            .where(*[
+                a == b for a, b in zip(
+                    customer_key(customers.c.shop_name, customers.c.phone),
+                    customer_key(staged.c.shop_name, staged.c.phone),
+                )
+            ])
+            .limit(1)
+            .scalar_subquery()
+        )
+        return func.coalesce(staged.c.customer_id, lookup)
+
+    customer_id = resolved_customer(s)
+    dedup_fields = (
+        "delivered_by", "trays_holding", "trays_returned",
+        "bottles_holding", "bottles_returned", "bottles_damaged",
+    )
+
+    def same_order(other, other_customer_id):
+        return and_(
+            other_customer_id.is_not_distinct_from(customer_id),
+            other.c.created_at == s.c.created_at,
+            *[other.c[f].is_not_distinct_from(s.c[f]) for f in dedup_fields],
+        )
+
+    unresolved_filter = and_(s.c.shop_name.is_not(None), customer_id.is_(None))
+    unresolved = conn.execute(
+        select(func.count()).select_from(s).where(unresolved_filter)
+    ).scalar_one()
+
+    columns = [c for c in ORDER_COLUMNS if c not in ("customer_id", "created_at")]
+    new_rows = select(
+        customer_id,
+        func.coalesce(s.c.created_at, func.now()),
+        *[s.c[name] for name in columns],
+    ).where(
+        ~unresolved_filter,
+        ~_unknown_customer(s),
+        # Rows without a timestamp cannot be matched against history
+        (s.c.created_at.is_(None)) | and_(
+            ~exists().where(same_order(existing, existing.c.customer_id)),
+            ~exists().where(and_(
+                same_order(earlier, resolved_customer(earlier)),
+                earlier.c.line_no < s.c.line_no,
+            )),
+        ),
+    )
+    result = conn.execute(
+        insert(existing).from_select(["customer_id", "created_at", *columns], new_rows)
+    )
+    return result.rowcount, unresolved
+
+
+# -----------------------------
+# ENTRY POINT
+# -----------------------------
+
+def import_file(
+    engine: Engine,
+    kind: ImportKind,
+    stream: TextIO,
+    fmt: str = "csv",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ImportResult:
+    """
+    Stream, validate and import a customers or orders file in one transaction.
+    Invalid rows are skipped and reported; valid rows are merged.
+    """
+    kind = ImportKind(kind)
+    if kind == ImportKind.customers:
+        schema, staging = CustomerCreate, customers_staging
+    else:
+        schema, staging = OrderImportRow, orders_staging
+
+    rows_read = rows_valid = 0
+    errors: list[ImportRowError] = []
+
+    with engine.begin() as conn:
+        staging.drop(conn, checkfirst=True)
+        staging.create(conn)
+
+        for chunk in _chunks(iter_records(stream, fmt), chunk_size):
+            valid_rows = []
+            for line_no, record, parse_error in chunk:
+                rows_read += 1
+                if parse_error is None:
+                    try:
+                        row = schema.model_validate(record).model_dump()
+                    except ValidationError as e:
+                        parse_error = e.errors(include_url=False, include_context=False)
+                if parse_error is not None:
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append(ImportRowError(
+                            line=line_no,
+                            errors=parse_error if isinstance(parse_error, list) else [parse_error]
+                        ))
+                    continue
+                row["line_no"] = line_no
+                valid_rows.append(row)
+
+            rows_valid += len(valid_rows)
+            _load_staging(conn, staging, valid_rows)
+
+        unresolved = unknown_customers = 0
+        if kind == ImportKind.customers:
+            inserted = _merge_customers(conn)
+        else:
+            unknown_customers, unknown_errors = _unknown_customer_rows(
+                conn, MAX_REPORTED_ERRORS - len(errors)
+            )
+            errors.extend(unknown_errors)
+            inserted, unresolved = _merge_orders(conn)
+            # Historical rows change already rolled-up days
+            staged_day = day_of(orders_staging.c.created_at, conn.dialect.name)
+            mark_rollup_dirty(conn, conn.execute(
+                select(staged_day).where(orders_staging.c.created_at.is_not(None)).distinct()
+            ).scalars())
+
+        staging.drop(conn)
+
+    return ImportResult(
+        kind=kind,
+        rows_read=rows_read,
+        rows_valid=rows_valid,
+        rows_invalid=rows_read - rows_valid,
+        inserted=inserted,
+        duplicates=rows_valid - inserted - unresolved - unknown_customers,
+        unresolved=unresolved,
+        unknown_customers=unknown_customers,
+        errors=errors,
+    )
@@ -0,0 +1,167 @@
+"""
+Set-based partial updates for PATCH /orders/bulk and PATCH /order-temp/bulk.
+
+The request body is either
+- items: [{"id": 1, "changes": {...}}, ...]
+    items with identical changes become one UPDATE ... WHERE id IN (...);
+    the rest are grouped by the columns they change and applied with one
+    UPDATE ... FROM (VALUES ...) per group on PostgreSQL (one UPDATE per
+    row elsewhere)
+- filter + changes: one UPDATE ... WHERE <filter>
+
+Statements run in the caller's transaction and return the updated rows
+via RETURNING. A filter may match at most BULK_FILTER_MAX_ROWS rows.
+"""
+
+import os
+from collections import defaultdict
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import Integer, Table, cast, column, func, select, update, values
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from utils.batch import MAX_BATCH_IDS, in_requested_order
+from utils.partitions import created_at_range
+
+# Filter fields compared for equality (start/end are a created_at range)
+FILTER_COLUMNS = ("customer_id", "delivered_by", "payment_status", "review_status")
+# Rows a filter-mode bulk request may touch (the response lists them all)
+BULK_FILTER_MAX_ROWS = int(os.getenv("BULK_FILTER_MAX_ROWS", "2000"))
+
+
+def filter_conditions(table: Table, filter: BaseModel) -> list:
+    """WHERE conditions for a bulk filter; at least one field must be set"""
+    given = filter.model_dump(exclude_unset=True)
+    conditions = [table.c[name] == given[name] for name in FILTER_COLUMNS if name in given]
+    conditions += created_at_range(table.c.created_at, given.get("start"), given.get("end"))
+    if not conditions:
+        raise HTTPException(status_code=400, detail="filter must set at least one field")
+    return conditions
+
+
+def check_filter_size(db: Session, table: Table, conditions: list, max_rows: int = BULK_FILTER_MAX_ROWS) -> None:
+    """Reject a filter matching more than max_rows rows (400)"""
+    matched = db.execute(select(func.count()).select_from(table).where(*conditions)).scalar()
+    if matched > max_rows:
+        raise HTTPException(
+            status_code=400,
+            detail=f"filter matches {matched} rows; at most {max_rows} per request, narrow it (e.g. start/end)"
+        )
+
+
+def parse_bulk_patch(body: BaseModel) -> tuple[Optional[list[tuple[int, dict]]], Optional[dict]]:
+    """
+    Validate a bulk PATCH body. Returns (items, None) for per-row changes
+    or (None, changes) for filter + changes.
+    """
+    if body.items is not None:
+        if body.filter is not None or body.changes is not None:
+            raise HTTPException(status_code=400, detail="Send either items, or filter and changes")
+        if not body.items:
+            raise HTTPException(status_code=400, detail="At least one item must be provided")
+        if len(body.items) > MAX_BATCH_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} items per request")
+        ids = [item.id for item in body.items]
+        if len(set(ids)) != len(ids):
+            raise HTTPException(status_code=400, detail="Each id may appear only once")
+        return [(item.id, item.changes.model_dump(exclude_unset=True)) for item in body.items], None
+
+    if body.filter is None or body.changes is None:
+        raise HTTPException(status_code=400, detail="Send either items, or filter and changes")
+    changes = body.changes.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="changes must set at least one field")
+    return None, changes
+
+
+def update_where(db: Session, table: Table, conditions: list, changes: dict) -> list[Row]:
+    """UPDATE table SET changes WHERE conditions RETURNING *"""
+    return db.execute(
+        update(table).where(*conditions).values(**changes).returning(*table.c)
+    ).all()
+
+
+def update_items(db: Session, table: Table, pk, items: list[tuple[int, dict]]) -> list[Row]:
+    """Apply per-row changes with as few statements as possible"""
+    rows: list[Row] = []
+    same_changes: dict[tuple, list[int]] = defaultdict(list)
+    for row_id, changes in items:
+        if changes:
+            same_changes[tuple(sorted(changes.items()))].append(row_id)
+
+    same_columns: dict[tuple, list[tuple[int, dict]]] = defaultdict(list)
+    for key, ids in same_changes.items():
+        if len(ids) > 1:
+            rows += update_where(db, table, [pk.in_(ids)], dict(key))
+        else:
+            same_columns[tuple(name for name, _ in key)].append((ids[0], dict(key)))
+
+    postgres = db.get_bind().dialect.name == "postgresql"
+    for names, group in same_columns.items():
+        if postgres and len(group) > 1:
+            # UPDATE t SET a = v.a, ... FROM (VALUES (id, a, ...), ...) AS v(id, a, ...) WHERE t.id = v.id
+            v = values(
+                column("id", Integer),
+                *[column(name, table.c[name].type) for name in names],
+                name="v"
+            ).data([(row_id, *[changes[name] for name in names]) for row_id, changes in group])
+            rows += db.execute(
+                update(table)
+                .where(pk == v.c.id)
+                # Cast back: a VALUES column of only NULLs is typed text
+                .values({name: cast(v.c[name], table.c[name].type) for name in names})
+                .returning(*table.c)
+            ).all()
+        else:
+            for row_id, changes in group:
+                rows += update_where(db, table, [pk == row_id], changes)
+    return rows
+
+
+def previous_values(db: Session, table: Table, pk, conditions: list, name: str) -> dict:
+    """Current value of one column for the rows about to be updated, locked until commit"""
+    return dict(db.execute(
+        select(pk, table.c[name]).where(*conditions).with_for_update()
+    ).all())
+
+
+def bulk_event_data(body: BaseModel, rows: list[Row], pk_name: str = "order_id") -> dict:
+    """
+    Dashboard event data for a bulk request. ID lists (at most
+    MAX_BATCH_IDS) are sent as-is; for a filter only the filter and the
+    count are sent, as pg_notify payloads are limited to 8000 bytes.
+    """
+    data: dict = {"count": len(rows)}
+    if body.filter is not None:
+        data["filter"] = body.filter.model_dump(mode="json", exclude_unset=True)
+    else:
+        data[f"{pk_name}s"] = [row._mapping[pk_name] for row in rows]
+    return data
+
+
+def apply_bulk_patch(db: Session, table: Table, pk, body: BaseModel, track: Optional[str] = None) -> tuple[list[Row], dict]:
+    """
+    Run a bulk PATCH body against `table` (not committed). Returns the
+    updated rows (in request order for items) and, if `track` names a
+    column being changed, its previous value per primary key.
+    """
+    items, changes = parse_bulk_patch(body)
+    if items is not None:
+        ids = [row_id for row_id, _ in items]
+        conditions = [pk.in_(ids)]
+        changed = {name for _, item_changes in items for name in item_changes}
+    else:
+        conditions = filter_conditions(table, body.filter)
+        check_filter_size(db, table, conditions)
+        changed = set(changes)
+
+    previous = previous_values(db, table, pk, conditions, track) if track in changed else {}
+    if items is not None:
+        rows = update_items(db, table, pk, items)
+        rows = in_requested_order(rows, ids, key=lambda row: row._mapping[pk.name])
+    else:
+        rows = update_where(db, table, conditions, changes)
+    return rows, previous
@@ -0,0 +1,181 @@
+"""
+Per-route-group concurrency limits (bulkheads).
+
+The primary pool is small (5 connections on Render), so one burst of heavy
+aggregates or logins could hold every connection and starve cheap reads.
+Requests are sorted into groups by path; each limited group runs at most
+`limit` requests at a time, and up to `queue` more wait for a slot for at
+most BULKHEAD_QUEUE_TIMEOUT seconds. Anything beyond that is shed with 503
+and a Retry-After header. Requests outside the limited groups are not
+throttled here and keep the remaining connections.
+
+Each group can also run its transactions with its own PostgreSQL
+statement_timeout (database.statement_timeout).
+
+Current usage is reported at GET /health/ready.
+"""
+
+import asyncio
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from database import statement_timeout
+
+BULKHEAD_QUEUE_TIMEOUT = float(os.getenv("BULKHEAD_QUEUE_TIMEOUT", "5"))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+@dataclass
+class Bulkhead:
+    """At most `limit` concurrent requests; `queue` more may wait"""
+    name: str
+    limit: int
+    queue: int
+    statement_timeout_ms: Optional[int] = None
+    active: int = 0
+    waiting: int = 0
+    shed: int = 0
+    _slots: asyncio.Semaphore = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._slots = asyncio.Semaphore(self.limit)
+
+    async def acquire(self, timeout: float = BULKHEAD_QUEUE_TIMEOUT) -> bool:
+        """Take a slot, waiting in line if allowed; False means shed"""
+        if self.active < self.limit and not self.waiting:
+            await self._slots.acquire()  # free slot, returns immediately
+        else:
+            if self.waiting >= self.queue:
+                self.shed += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue": self.queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "shed": self.shed,
+        }
+
+
+# -----------------------------
+# GROUPS
+# -----------------------------
+
+BULKHEADS = {
+    # Aggregates and report results
+    "reports": Bulkhead(
+        "reports",
+        limit=_env_int("BULKHEAD_REPORTS_LIMIT", 2),
+        queue=_env_int("BULKHEAD_REPORTS_QUEUE", 8),
+        statement_timeout_ms=_env_int("REPORTS_STATEMENT_TIMEOUT_MS", 60000),
+    ),
+    # Bulk updates/deletes and CSV/JSON imports
+    "bulk": Bulkhead(
+        "bulk",
+        limit=_env_int("BULKHEAD_BULK_LIMIT", 1),
+        queue=_env_int("BULKHEAD_BULK_QUEUE", 4),
+        statement_timeout_ms=_env_int("BULK_STATEMENT_TIMEOUT_MS", 120000),
+    ),
+    # Logins (bcrypt work plus one lookup each)
+    "auth": Bulkhead(
+        "auth",
+        limit=_env_int("BULKHEAD_AUTH_LIMIT", 3),
+        queue=_env_int("BULKHEAD_AUTH_QUEUE", 20),
+    ),
+}
+
+# (group, method or None for any, path pattern); first match wins
+ROUTE_GROUPS = [
+    ("reports", "GET", re.compile(r"^/orders/(summary/.*|agents/summary|agent/[^/]+/summary)$")),
+    ("reports", "GET", re.compile(r"^/reports/.+")),
+    ("reports", "GET", re.compile(r"^/admin/metrics$")),
+    ("bulk", None, re.compile(r"^/(orders|order-temp)/bulk$")),
+    ("bulk", "POST", re.compile(r"^/admin/import/.+")),
+    ("auth", "POST", re.compile(r"^/auth/login$")),
+]
+
+
+def route_group(method: str, path: str) -> Optional[str]:
+    """Bulkhead group for a request, or None if it isn't limited"""
+    path = path.rstrip("/") or "/"
+    for group, group_method, pattern in ROUTE_GROUPS:
+        if (group_method is None or group_method == method) and pattern.match(path):
+            return group
+    return None
+
+
+def bulkhead_stats() -> dict:
+    return {name: bulkhead.stats() for name, bulkhead in BULKHEADS.items()}
+
+
+# -----------------------------
+# MIDDLEWARE
+# -----------------------------
+
+class BulkheadMiddleware:
+    """ASGI middleware: admit, queue or shed requests by route group"""
+
+    def __init__(self, app, queue_timeout: float = BULKHEAD_QUEUE_TIMEOUT):
+        self.app = app
+        self.queue_timeout = queue_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        group = route_group(scope["method"], scope["path"])
+        bulkhead = BULKHEADS.get(group)
+        if bulkhead is None or bulkhead.limit <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        if not await bulkhead.acquire(self.queue_timeout):
+            await self._shed(send, group)
+            return
+        try:
+            if bulkhead.statement_timeout_ms is None:
+                await self.app(scope, receive, send)
+            else:
+                # Copied into the threadpool that runs sync endpoints
+                with statement_timeout(bulkhead.statement_timeout_ms):
+                    await self.app(scope, receive, send)
+        finally:
+            bulkhead.release()
+
+    async def _shed(self, send, group: str) -> None:
+        body = json.dumps({
+            "detail": f"Too many concurrent {group} requests, retry shortly",
+            "status_code": 503,
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, round(self.queue_timeout))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
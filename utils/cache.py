@@ -0,0 +1,57 @@
+"""
+Versioned in-memory cache for small, frequently read lists (e.g. the
+agent picker's user options).
+
+Each entry remembers the cache version it was computed under;
+invalidate() bumps the version, so entries computed before a write are
+never served (or stored) afterwards. Writes invalidate through dashboard
+events ("user.created", ...), which on PostgreSQL reach every worker via
+LISTEN/NOTIFY; CACHE_TTL bounds staleness if an event is missed.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+
+
+class VersionedCache:
+    """Thread-safe key -> value cache dropped wholesale on invalidate()"""
+
+    def __init__(self, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._entries: dict[Hashable, tuple[int, float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == self.version and entry[1] > now:
+                return entry[2]
+            version = self.version
+        value = compute()
+        with self._lock:
+            # Don't store a value computed before a concurrent invalidation
+            if version == self.version:
+                self._entries[key] = (version, now + self.ttl, value)
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def invalidate_on(self, prefix: str) -> Callable[[dict], None]:
+        """Event handler invalidating the cache for event types starting with `prefix`"""
+        def handler(event: dict) -> None:
+            if str(event.get("type", "")).startswith(prefix):
+                self.invalidate()
+        return handler
+
+
+# Role option lists (GET /users/role/{role}/options)
+user_options_cache = VersionedCache()
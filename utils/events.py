@@ -0,0 +1,245 @@
+"""
+Live dashboard events.
+
+Write paths (orders, customers) publish small events such as
+"order.created" with the row and the metric deltas it causes. Subscribers
+(the /admin/stream SSE endpoint) receive them through an in-process pub/sub.
+
+Events are published inside the writing transaction and only delivered
+once it commits. On PostgreSQL they are sent with pg_notify, and every
+worker receives them through a LISTEN thread (psycopg2, or psycopg 3.2+ with
+a postgresql+psycopg:// URL). On other databases (SQLite,
+local development) they are dispatched in-process after the commit.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import select
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from sqlalchemy import create_engine, event as sa_event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = os.getenv("EVENTS_CHANNEL", "og_events")
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class EventBus:
+    """Fan out events to asyncio subscribers; safe to publish from any thread"""
+
+    def __init__(self):
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._handlers: list[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def add_handler(self, handler: Callable[[dict], None]) -> None:
+        """Call `handler(event)` synchronously for every event (e.g. cache invalidation)"""
+        self._handlers.append(handler)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = {s for s in self._subscribers if s[1] is not queue}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def dispatch(self, event: dict) -> None:
+        event = {"id": next(self._ids), **event}
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error("Event handler failed for %s: %s", event.get("type"), e)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Subscriber's loop is closed
+                self.unsubscribe(queue)
+
+
+def _offer(queue: asyncio.Queue, event: dict) -> None:
+    """Enqueue an event, dropping the oldest one for slow consumers"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+bus = EventBus()
+
+
+def publish_event(
+    db: Session,
+    event_type: str,
+    data: Any,
+    metrics: Optional[dict] = None,
+) -> None:
+    """
+    Publish a dashboard event for a write made with `db`; call it before
+    db.commit() so the event is delivered only if the write commits.
+    `metrics` holds deltas, e.g. {"total_orders": 1, "payment_status": {"paid": 1}}.
+    """
+    event = {"type": event_type, "data": data, "metrics": metrics or {}}
+    if db.get_bind().dialect.name == "postgresql":
+        # Delivered to every worker's listener when the transaction commits
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": NOTIFY_CHANNEL, "payload": json.dumps(event, default=str)}
+        )
+    elif db.in_transaction():
+        db.info.setdefault("pending_events", []).append(event)
+    else:
+        bus.dispatch(event)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _dispatch_pending_events(session: Session) -> None:
+    for event in session.info.pop("pending_events", []):
+        bus.dispatch(event)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _drop_pending_events(session: Session) -> None:
+    session.info.pop("pending_events", None)
+
+
+def payment_status_delta(old: Optional[str], new: Optional[str]) -> dict:
+    """Metric delta for an order moving from one payment status to another"""
+    delta: dict[str, int] = {}
+    if old == new:
+        return delta
+    if old:
+        delta[old] = delta.get(old, 0) - 1
+    if new:
+        delta[new] = delta.get(new, 0) + 1
+    return delta
+
+
+# -----------------------------
+# POSTGRES LISTENER
+# -----------------------------
+
+class NotifyListener(threading.Thread):
+    """
+    Background thread that LISTENs on the events channel and dispatches
+    notifications to the local bus. Uses its own connection outside the
+    request pool, and reconnects with backoff if it drops.
+    """
+
+    def __init__(self, database_url: str):
+        super().__init__(name="events-listener", daemon=True)
+        self._engine = create_engine(database_url, poolclass=NullPool)
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self._listen()
+                backoff = 1.0
+            except Exception as e:
+                logger.warning("Events listener error: %s; retrying in %.0fs", e, backoff)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    def _listen(self) -> None:
+        conn = self._engine.raw_connection()
+        try:
+            dbapi_conn = conn.dbapi_connection
+            dbapi_conn.autocommit = True
+            cursor = dbapi_conn.cursor()
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            if self._engine.dialect.driver == "psycopg":
+                self._receive_psycopg(dbapi_conn)
+            else:
+                self._receive_psycopg2(dbapi_conn)
+        finally:
+            conn.close()
+
+    def _receive_psycopg(self, dbapi_conn) -> None:
+        # psycopg 3 (3.2+ for the timeout): wakes every 5s to check for stop
+        while not self._stop.is_set():
+            for notification in dbapi_conn.notifies(timeout=5.0):
+                self._dispatch(notification.payload)
+
+    def _receive_psycopg2(self, dbapi_conn) -> None:
+        while not self._stop.is_set():
+            if select.select([dbapi_conn], [], [], 5.0) == ([], [], []):
+                continue
+            dbapi_conn.poll()
+            while dbapi_conn.notifies:
+                self._dispatch(dbapi_conn.notifies.pop(0).payload)
+
+    @staticmethod
+    def _dispatch(payload: str) -> None:
+        try:
+            bus.dispatch(json.loads(payload))
+        except ValueError:
+            logger.warning("Ignoring malformed event notification")
+
+
+def start_listener(engine: Engine) -> Optional[NotifyListener]:
+    """Start the LISTEN thread when running on PostgreSQL"""
+    if engine.dialect.name != "postgresql":
+        return None
+    listener = NotifyListener(engine.url.render_as_string(hide_password=False))
+    listener.start()
+    return listener
+
+
+# -----------------------------
+# SERVER-SENT EVENTS
+# -----------------------------
+
+def format_sse(event: dict) -> str:
+    """Format one event as a text/event-stream message"""
+    lines = []
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+KEEPALIVE_INTERVAL = 15.0
+
+
+async def stream_events(queue: asyncio.Queue, is_disconnected, first: Optional[dict] = None):
+    """Yield SSE messages from a subscriber queue until the client goes away"""
+    if first is not None:
+        yield format_sse(first)
+    last_sent = time.monotonic()
+    while True:
+        if await is_disconnected():
+            break
+        try:
+            event = await asyncio.wait_for(queue.get(), timeout=1.0)
+        except asyncio.TimeoutError:
+            if time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            continue
+        last_sent = time.monotonic()
+        yield format_sse(event)
@@ -0,0 +1,72 @@
+"""
+Sparse fieldsets and compact list payloads.
+
+List endpoints accept:
+- fields=shop_name,phone   only these columns are SELECTed and returned
+                           (the primary key is always included)
+- format=columnar          {"count": n, "columns": {"id": [...], ...}}
+                           instead of one object per row
+
+Without these parameters the endpoints behave exactly as before.
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import inspect
+from sqlalchemy.orm import Query as ORMQuery
+
+
+class FieldSelection:
+    """Parsed fields/format query parameters for a list endpoint"""
+
+    def __init__(self, fields: Optional[str], format: str):
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        self.format = format
+
+    @property
+    def is_default(self) -> bool:
+        return self.fields is None and self.format == "rows"
+
+    def columns(self, model) -> list[str]:
+        """Validated column names to select, primary key first"""
+        mapper = inspect(model)
+        available = [c.key for c in mapper.column_attrs]
+        if self.fields is None:
+            return available
+        unknown = [f for f in self.fields if f not in available]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(available)}"
+            )
+        pk = [c.key for c in mapper.primary_key]
+        return pk + [f for f in dict.fromkeys(self.fields) if f not in pk]
+
+    def respond(self, query: ORMQuery, model) -> JSONResponse:
+        """Run `query` selecting only the requested columns and shape the payload"""
+        names = self.columns(model)
+        rows = query.with_entities(*[getattr(model, name) for name in names]).all()
+        if self.format == "columnar":
+            content = {
+                "count": len(rows),
+                "columns": {name: [row[i] for row in rows] for i, name in enumerate(names)},
+            }
+        else:
+            content = [dict(zip(names, row)) for row in rows]
+        return JSONResponse(content=jsonable_encoder(content))
+
+
+def field_selection(
+    fields: Optional[str] = Query(
+        None, description="Comma-separated columns to return (primary key is always included)"
+    ),
+    format: str = Query(
+        "rows", pattern="^(rows|columnar)$",
+        description="rows: list of objects; columnar: one array per column"
+    ),
+) -> FieldSelection:
+    """Dependency for list endpoints supporting sparse fieldsets"""
+    return FieldSelection(fields, format)
@@ -1,16 +1,48 @@
+import os
 import bcrypt
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost for new hashes; older hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Accept legacy plain-text passwords and the passlib fallback.
+# Set LEGACY_PASSWORDS=0 once `python migrate_passwords.py` has run.
+LEGACY_PASSWORDS = os.getenv("LEGACY_PASSWORDS", "1").lower() in ("1", "true", "yes")
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+_pwd_context = None
+
+
+def get_pwd_context():
+    """passlib context, imported on first use (only needed as a fallback)"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
     # Use bcrypt directly to avoid passlib compatibility issues
-    salt = bcrypt.gensalt(rounds=12)
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 
+def needs_rehash(hashed: str) -> bool:
+    """
+    True if the stored value is not a $2b$ bcrypt hash at the configured cost
+    (legacy plain text, $2a$/$2y$ variants, or a different cost).
+    """
+    hashed = (hashed or "").strip()
+    if not hashed.startswith('$2b$'):
+        return True
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
 def verify_password(plain: str, hashed: str) -> bool:
     """
     Verify a plain text password against a hashed password.
@@ -23,21 +55,23 @@ def verify_password(plain: str, hashed: str) -> bool:
     hashed = hashed.strip()
     
     # Check if the hash is a valid bcrypt hash (starts with $2b$, $2a$, or $2y$)
-    if hashed.startswith(('$2a$', '$2b$', '$2y$')):
+    if hashed.startswith(BCRYPT_PREFIXES):
         try:
             # Use bcrypt directly instead of passlib to avoid compatibility issues
             return bcrypt.checkpw(plain.encode('utf-8'), hashed.encode('utf-8'))
         except Exception as e:
+            if not LEGACY_PASSWORDS:
+                return False
             # If bcrypt fails, try passlib as fallback
             try:
-                return pwd_context.verify(plain, hashed)
+                return get_pwd_context().verify(plain, hashed)
             except Exception:
                 return False
     
-    # If it's not a bcrypt hash, it might be stored as plain text (legacy)
-    # For security, we should migrate these, but for now allow comparison
-    # WARNING: This is insecure and should be removed after migration
-    if hashed == plain:
+    # If it's not a bcrypt hash, it might be stored as plain text (legacy).
+    # Such rows are rehashed on login and by migrate_passwords.py.
+    # WARNING: This is insecure; set LEGACY_PASSWORDS=0 after migration
+    if LEGACY_PASSWORDS and hashed == plain:
         return True
     
     return False
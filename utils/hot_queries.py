@@ -0,0 +1,93 @@
+"""
+Precompiled hot-path queries.
+
+db.query(Model).filter(...) builds a new statement on every request and
+derives its cache key before the compiled SQL can be reused. The lookups
+below are built once at import with bind parameters, so each call only
+binds values: the statement's cache key is memoized and its compiled
+form comes straight from the engine's compiled cache (QUERY_CACHE_SIZE).
+lambda_stmt was measured too; it saves less than prebuilt statements
+because it still analyses the lambda's closure on every call.
+
+Server-side prepared statements depend on the driver: with psycopg 3
+(postgresql+psycopg:// URLs) a statement executed PG_PREPARE_THRESHOLD
+times on a connection is prepared by the server (see database.py).
+psycopg2 does not support them, so there the saving is client-side only.
+
+Measure with: python bench_hot_queries.py
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import Session
+
+from models.customer import Customer
+from models.order import Order
+from models.user import User
+
+_ORDER_BY_ID = select(Order).where(Order.order_id == bindparam("order_id"))
+_CUSTOMER_BY_ID = select(Customer).where(Customer.id == bindparam("customer_id"))
+_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+_USER_BY_EMAIL = select(User).where(func.lower(User.email) == func.lower(bindparam("email"))).limit(1)
+_USER_BY_PHONE = select(User).where(User.phone == bindparam("phone"))
+_AGENT_ORDER_TOTALS = select(
+    func.count(Order.order_id).label("total_orders"),
+    func.coalesce(func.sum(Order.trays_holding), 0).label("total_trays_outside"),
+    func.coalesce(func.sum(Order.trays_returned), 0).label("total_trays_received"),
+    func.coalesce(func.sum(Order.bottles_holding), 0).label("total_bottles_delivered"),
+    func.coalesce(func.sum(Order.bottles_returned), 0).label("total_bottles_returned"),
+    func.coalesce(func.sum(Order.bottles_damaged), 0).label("total_bottles_damaged"),
+).where(Order.delivered_by == bindparam("user_id"))
+# Both served by ix_orders_customer_id_created_at
+_RECENT_CUSTOMER_ORDERS = (
+    select(Order)
+    .where(Order.customer_id == bindparam("customer_id"))
+    .order_by(Order.created_at.desc(), Order.order_id.desc())
+    .limit(bindparam("limit"))
+)
+_CUSTOMER_ORDER_STATS = select(
+    func.count(Order.order_id).label("orders"),
+    func.coalesce(func.sum(Order.bottles_holding), 0).label("bottles_delivered"),
+    func.coalesce(func.sum(Order.bottles_returned), 0).label("bottles_returned"),
+    func.coalesce(func.sum(Order.bottles_damaged), 0).label("bottles_damaged"),
+).where(Order.customer_id == bindparam("customer_id"), Order.created_at >= bindparam("since"))
+
+
+def get_order(db: Session, order_id: int) -> Optional[Order]:
+    return db.execute(_ORDER_BY_ID, {"order_id": order_id}).scalar_one_or_none()
+
+
+def get_customer(db: Session, customer_id: int) -> Optional[Customer]:
+    return db.execute(_CUSTOMER_BY_ID, {"customer_id": customer_id}).scalar_one_or_none()
+
+
+def get_user(db: Session, user_id: int) -> Optional[User]:
+    return db.execute(_USER_BY_ID, {"user_id": user_id}).scalar_one_or_none()
+
+
+def user_by_email(db: Session, email: str) -> Optional[User]:
+    """Case-insensitive email match"""
+    return db.execute(_USER_BY_EMAIL, {"email": email}).scalars().first()
+
+
+def user_by_phone(db: Session, phone: str) -> Optional[User]:
+    return db.execute(_USER_BY_PHONE, {"phone": phone}).scalar_one_or_none()
+
+
+def agent_order_totals(db: Session, user_id: int):
+    """Row of total_orders and total_* sums for orders delivered by user_id"""
+    return db.execute(_AGENT_ORDER_TOTALS, {"user_id": user_id}).one()
+
+
+def recent_customer_orders(db: Session, customer_id: int, limit: int) -> list[Order]:
+    """A customer's newest orders first"""
+    return list(db.execute(
+        _RECENT_CUSTOMER_ORDERS, {"customer_id": customer_id, "limit": limit}
+    ).scalars())
+
+
+def customer_order_stats(db: Session, customer_id: int, since: datetime):
+    """Row of order count and bottle sums for a customer's orders since `since`"""
+    return db.execute(_CUSTOMER_ORDER_STATS, {"customer_id": customer_id, "since": since}).one()
@@ -0,0 +1,180 @@
+"""
+In-process background jobs for heavy reports, backed by the report_jobs table.
+
+POST /reports/{kind} stores a queued job and hands its ID to a small
+thread pool (the work is in the database, so threads are enough). A worker
+claims a job with a conditional UPDATE (queued -> running), so a job runs
+once even with several app workers. The JSON result is written as it is
+produced, in pieces of about REPORT_RESULT_CHUNK_BYTES (report_job_chunks),
+each in its own short transaction, so neither the worker nor
+GET /reports/{id} holds a whole export in memory and a job only keeps its
+read connection checked out. The job is marked done after the last piece;
+a failed job's pieces are deleted.
+
+Jobs survive restarts: a poller started from main.lifespan picks up queued
+jobs nobody is running, and requeues jobs stuck in running for longer than
+REPORT_JOB_TIMEOUT (their worker died), up to REPORT_MAX_ATTEMPTS times.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Engine
+
+from database import read_engine, statement_timeout
+from models.report_job import ReportJob, ReportJobChunk
+from utils.reports import REPORTS
+
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_POLL_INTERVAL = float(os.getenv("REPORT_POLL_INTERVAL", "10"))
+REPORT_JOB_TIMEOUT = float(os.getenv("REPORT_JOB_TIMEOUT", "900"))
+REPORT_MAX_ATTEMPTS = int(os.getenv("REPORT_MAX_ATTEMPTS", "3"))
+REPORT_RESULT_CHUNK_BYTES = int(os.getenv("REPORT_RESULT_CHUNK_BYTES", str(256 * 1024)))
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+# Job IDs submitted to this process's pool and not finished yet
+_inflight: set[str] = set()
+_inflight_lock = threading.Lock()
+
+
+def dispatch(engine: Engine, job_id: str) -> None:
+    """Queue a job on this process's pool (no-op if it's already queued here)"""
+    with _inflight_lock:
+        if job_id in _inflight:
+            return
+        _inflight.add(job_id)
+    _executor.submit(run_job, engine, job_id)
+
+
+def _claim(engine: Engine, job_id: str):
+    """Mark a queued job as running; returns (kind, params) or None if taken"""
+    jobs = ReportJob.__table__
+    with engine.begin() as conn:
+        claimed = conn.execute(
+            update(jobs)
+            .where(jobs.c.id == job_id, jobs.c.status == "queued")
+            .values(
+                status="running",
+                started_at=datetime.now(timezone.utc),
+                attempts=jobs.c.attempts + 1,
+            )
+        ).rowcount
+        if claimed != 1:
+            return None
+        return conn.execute(select(jobs.c.kind, jobs.c.params).where(jobs.c.id == job_id)).one()
+
+
+def _finish(engine: Engine, job_id: str, status: str, error: Optional[str] = None) -> None:
+    jobs = ReportJob.__table__
+    chunks = ReportJobChunk.__table__
+    with engine.begin() as conn:
+        finished = conn.execute(
+            update(jobs)
+            .where(jobs.c.id == job_id, jobs.c.status == "running")
+            .values(status=status, error=error, finished_at=datetime.now(timezone.utc))
+        ).rowcount
+        if finished and status == "failed":
+            conn.execute(delete(chunks).where(chunks.c.job_id == job_id))
+
+
+def _json_chunks(result: Any, chunk_bytes: int = REPORT_RESULT_CHUNK_BYTES) -> Iterator[str]:
+    """A report result as JSON text, in pieces of about chunk_bytes"""
+    if isinstance(result, dict):
+        yield json.dumps(result, default=str)
+        return
+    parts, size = ["["], 1
+    for i, row in enumerate(result):
+        part = ("," if i else "") + json.dumps(row, default=str)
+        parts.append(part)
+        size += len(part)
+        if size >= chunk_bytes:
+            yield "".join(parts)
+            parts, size = [], 0
+    parts.append("]")
+    yield "".join(parts)
+
+
+def run_job(engine: Engine, job_id: str) -> None:
+    """Claim and compute one job; results and errors are stored on the row"""
+    try:
+        claimed = _claim(engine, job_id)
+        if claimed is None:
+            return
+        chunks = ReportJobChunk.__table__
+        size = 0
+        try:
+            with engine.begin() as out:
+                out.execute(delete(chunks).where(chunks.c.job_id == job_id))  # from an earlier attempt
+            # Reports may outlive the request statement_timeout, not the job timeout
+            with statement_timeout(int(REPORT_JOB_TIMEOUT * 1000)), read_engine.connect() as conn:
+                result = REPORTS[claimed.kind](conn, json.loads(claimed.params or "{}"))
+                for seq, data in enumerate(_json_chunks(result)):
+                    # One short transaction per piece: only the read connection
+                    # stays checked out while the report runs
+                    with engine.begin() as out:
+                        out.execute(insert(chunks).values(job_id=job_id, seq=seq, data=data))
+                    size += len(data)
+            # Readers only fetch pieces once the job is done
+            _finish(engine, job_id, "done")
+        except Exception as e:
+            logger.error("Report job %s (%s) failed: %s", job_id, claimed.kind, e)
+            _finish(engine, job_id, "failed", error=str(e))
+            return
+        logger.info("Report job %s (%s) done, %d bytes", job_id, claimed.kind, size)
+    except Exception as e:
+        logger.error("Report job %s could not be run: %s", job_id, e)
+    finally:
+        with _inflight_lock:
+            _inflight.discard(job_id)
+
+
+def recover_jobs(engine: Engine, limit: int = REPORT_WORKERS * 4) -> list[str]:
+    """
+    Requeue (or fail, after REPORT_MAX_ATTEMPTS) jobs stuck in running and
+    return the IDs of the oldest queued jobs.
+    """
+    jobs = ReportJob.__table__
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=REPORT_JOB_TIMEOUT)
+    with engine.begin() as conn:
+        stale = (jobs.c.status == "running", jobs.c.started_at < cutoff)
+        conn.execute(
+            update(jobs)
+            .where(*stale, jobs.c.attempts >= REPORT_MAX_ATTEMPTS)
+            .values(status="failed", error="Timed out", finished_at=datetime.now(timezone.utc))
+        )
+        requeued = conn.execute(
+            update(jobs).where(*stale).values(status="queued")
+        ).rowcount
+        if requeued:
+            logger.warning("Requeued %d report jobs stuck in running", requeued)
+        return list(conn.execute(
+            select(jobs.c.id)
+            .where(jobs.c.status == "queued")
+            .order_by(jobs.c.created_at)
+            .limit(limit)
+        ).scalars())
+
+
+async def run_job_poller(engine: Engine, interval: float = REPORT_POLL_INTERVAL) -> None:
+    """Background task: resume queued jobs (e.g. after a restart) every `interval`"""
+    while True:
+        try:
+            for job_id in await asyncio.to_thread(recover_jobs, engine):
+                dispatch(engine, job_id)
+        except Exception as e:
+            logger.error("Report job poll failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+def shutdown() -> None:
+    """Stop taking new work; queued jobs stay in the table for the next start"""
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,126 @@
+"""
+Background database maintenance, started from main.lifespan.
+
+- Expires abandoned order_temp drafts older than ORDER_TEMP_MAX_AGE_DAYS.
+  Rows are deleted in small batches, each in its own short transaction,
+  skipping rows locked by in-flight edits, so the table is never locked
+  for long.
+- Refreshes the daily agent rollup (utils.rollups) so leaderboard reports
+  only aggregate today's orders live.
+- Creates upcoming monthly orders partitions (ORDERS_PARTITIONED=1), so a
+  long-running worker never writes new months into the DEFAULT partition,
+  and with ORDERS_AUTO_ARCHIVE=1 archives months older than
+  ORDERS_HOT_MONTHS.
+- With RATE_LIMIT_STORE=table, deletes login rate-limit buckets that have
+  been idle long enough to refill, so rate_limit_buckets stays small.
+
+The outcome of the last run is kept in `maintenance_status` and exposed
+at GET /admin/maintenance.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Engine
+
+from database import statement_timeout
+from models.order_temp import OrderTemp
+from utils.partitions import ORDERS_AUTO_ARCHIVE, archive_orders, ensure_partitions
+from utils.rate_limit import RATE_LIMIT_STORE, prune_buckets
+from utils.rollups import refresh_agent_rollup
+
+logger = logging.getLogger(__name__)
+
+# 0 disables draft expiry
+ORDER_TEMP_MAX_AGE_DAYS = float(os.getenv("ORDER_TEMP_MAX_AGE_DAYS", "14"))
+ORDER_TEMP_CLEANUP_BATCH = int(os.getenv("ORDER_TEMP_CLEANUP_BATCH", "500"))
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "3600"))
+# Pause between batches so cleanup never hogs the database
+BATCH_PAUSE = 0.05
+
+maintenance_status: dict = {
+    "last_run_at": None,
+    "order_temp_expired": 0,
+    "order_temp_expired_total": 0,
+    "rollup_days_refreshed": 0,
+    "partitions_failed": 0,
+    "orders_archived": 0,
+    "rate_limit_buckets_pruned": 0,
+    "duration_seconds": None,
+    "error": None,
+}
+
+
+def _expire_batch(engine: Engine, cutoff: datetime, batch_size: int) -> int:
+    order_temp = OrderTemp.__table__
+    with engine.begin() as conn:
+        stale_ids = (
+            select(order_temp.c.order_id)
+            .where(order_temp.c.created_at < cutoff)
+            .order_by(order_temp.c.order_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = conn.execute(
+            delete(order_temp).where(order_temp.c.order_id.in_(stale_ids))
+        )
+        return result.rowcount
+
+
+def expire_order_temp_drafts(
+    engine: Engine,
+    max_age_days: float = ORDER_TEMP_MAX_AGE_DAYS,
+    batch_size: int = ORDER_TEMP_CLEANUP_BATCH,
+) -> int:
+    """Delete order_temp drafts older than max_age_days; returns rows removed"""
+    if max_age_days <= 0:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+    removed = 0
+    while True:
+        deleted = _expire_batch(engine, cutoff, batch_size)
+        removed += deleted
+        if deleted < batch_size:
+            return removed
+        time.sleep(BATCH_PAUSE)
+
+
+def run_once(engine: Engine) -> dict:
+    """Run every maintenance job once and record the outcome"""
+    started = time.monotonic()
+    try:
+        # No request statement_timeout: a first rollup covers all history
+        with statement_timeout(0):
+            expired = expire_order_temp_drafts(engine)
+            maintenance_status["order_temp_expired"] = expired
+            maintenance_status["order_temp_expired_total"] += expired
+            maintenance_status["error"] = None
+            if expired:
+                logger.info("Expired %d stale order_temp drafts", expired)
+            maintenance_status["rollup_days_refreshed"] = refresh_agent_rollup(engine)
+            maintenance_status["partitions_failed"] = ensure_partitions(engine)
+            if ORDERS_AUTO_ARCHIVE:
+                archived = archive_orders(engine)
+                maintenance_status["orders_archived"] = archived
+                if archived:
+                    logger.info("Archived %d orders", archived)
+            if RATE_LIMIT_STORE == "table":
+                maintenance_status["rate_limit_buckets_pruned"] = prune_buckets(engine)
+    except Exception as e:
+        maintenance_status["error"] = str(e)
+        logger.error("Maintenance run failed: %s", e)
+    maintenance_status["last_run_at"] = datetime.now(timezone.utc).isoformat()
+    maintenance_status["duration_seconds"] = round(time.monotonic() - started, 3)
+    return maintenance_status
+
+
+async def run_maintenance(engine: Engine, interval: float = MAINTENANCE_INTERVAL) -> None:
+    """Background task: run maintenance shortly after startup, then every `interval`"""
+    await asyncio.sleep(min(60.0, interval))
+    while True:
+        await asyncio.to_thread(run_once, engine)
+        await asyncio.sleep(interval)
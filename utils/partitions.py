@@ -0,0 +1,518 @@
+"""
+Monthly partitioning and archival of the orders table.
+
+PostgreSQL (ORDERS_PARTITIONED=1):
+- orders is a RANGE-partitioned table on created_at, one partition per
+  month (orders_y2026m01, ...) plus a DEFAULT partition as a safety net
+- partitions for upcoming months are created at startup and by every
+  maintenance run (utils.maintenance); rows that already landed in the
+  DEFAULT partition for such a month are moved into the new partition
+- closed months are archived by copying their partition to orders_archive
+  (or a gzip NDJSON file) while it is still attached, then detaching and
+  dropping it in short transactions; with ORDERS_AUTO_ARCHIVE=1
+  maintenance does this too, otherwise run `python manage_orders.py archive`
+
+SQLite / unpartitioned PostgreSQL:
+- the same archival job moves old rows to orders_archive in small batches
+
+Date-bounded queries should filter with created_at_range(), a plain range
+on created_at, so PostgreSQL prunes partitions and the created_at index is
+used (CAST(created_at AS DATE) prevents both).
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from models.order import Order, OrderArchive
+
+logger = logging.getLogger(__name__)
+
+ORDERS_PARTITIONED = os.getenv("ORDERS_PARTITIONED", "").lower() in ("1", "true", "yes")
+# Months kept in the hot orders table; older months are archived
+ORDERS_HOT_MONTHS = int(os.getenv("ORDERS_HOT_MONTHS", "12"))
+# Archive closed months from the maintenance loop instead of only by CLI
+ORDERS_AUTO_ARCHIVE = os.getenv("ORDERS_AUTO_ARCHIVE", "").lower() in ("1", "true", "yes")
+# Future monthly partitions created ahead of time
+PARTITIONS_AHEAD = 3
+ARCHIVE_BATCH_SIZE = 1000
+# How long archival waits for the lock on orders before trying again next run
+ARCHIVE_LOCK_TIMEOUT_MS = int(os.getenv("ARCHIVE_LOCK_TIMEOUT_MS", "5000"))
+# pg_advisory_lock key serializing partition DDL and archival across processes
+PARTITIONS_LOCK_KEY = 731_000_031
+
+ORDER_COLUMNS = [c.name for c in Order.__table__.columns]
+_PARTITION_NAME = re.compile(r"^orders_y(\d{4})m(\d{2})$")
+
+
+# -----------------------------
+# DATE RANGES
+# -----------------------------
+
+def created_at_range(column, start: Optional[date] = None, end: Optional[date] = None) -> list:
+    """
+    Filter conditions for start <= created_at < end + 1 day (end inclusive).
+    Sargable, so the planner can prune partitions and use the index.
+    """
+    conditions = []
+    if start is not None:
+        conditions.append(column >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        conditions.append(column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return conditions
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"orders_y{month.year:04d}m{month.month:02d}"
+
+
+def default_archive_cutoff(today: Optional[date] = None) -> date:
+    """First month kept hot; everything before it is archived"""
+    today = today or datetime.now(timezone.utc).date()
+    return add_months(month_start(today), -ORDERS_HOT_MONTHS)
+
+
+# -----------------------------
+# PARTITION MANAGEMENT (POSTGRES)
+# -----------------------------
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(text(
+        "SELECT c.relkind FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'orders' AND n.nspname = current_schema()"
+    )).scalar()
+    return relkind == "p"
+
+
+def _create_partitioned_orders(conn: Connection) -> None:
+    """CREATE TABLE orders ... PARTITION BY RANGE (created_at) from the model"""
+    table = Order.__table__
+    parts = [str(CreateColumn(c).compile(dialect=conn.dialect)) for c in table.columns]
+    for column in table.columns:
+        for fk in column.foreign_keys:
+            # This runs before create_all on a fresh database, so create the
+            # referenced table (customers) first
+            fk.column.table.create(conn, checkfirst=True)
+            parts.append(
+                f"FOREIGN KEY ({column.name}) "
+                f"REFERENCES {fk.column.table.name} ({fk.column.name})"
+            )
+    # The partition key must be part of the primary key
+    parts.append("PRIMARY KEY (order_id, created_at)")
+    conn.execute(text(
+        "CREATE TABLE orders (\n    " + ",\n    ".join(parts) + "\n) PARTITION BY RANGE (created_at)"
+    ))
+    for index in table.indexes:
+        conn.execute(CreateIndex(index))
+    conn.execute(text("CREATE TABLE IF NOT EXISTS orders_default PARTITION OF orders DEFAULT"))
+
+
+def create_month_partition(conn: Connection, month: date) -> None:
+    start = month_start(month)
+    end = add_months(start, 1)
+    name = partition_name(start)
+    bounds = f"FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return
+    in_month = (
+        f"created_at >= '{start.isoformat()} 00:00:00+00' "
+        f"AND created_at < '{end.isoformat()} 00:00:00+00'"
+    )
+    has_default_rows = conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM orders_default WHERE {in_month})"
+    )).scalar()
+    if not has_default_rows:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF orders FOR VALUES {bounds}"))
+        return
+    # The month's orders went to DEFAULT (no partition existed yet), and a
+    # partition can't be created while DEFAULT holds rows in its range:
+    # build it as a plain table, move the rows over, then attach it
+    conn.execute(text(f"CREATE TABLE {name} (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM orders_default WHERE {in_month} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )).rowcount
+    conn.execute(text(f"ALTER TABLE orders ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    logger.info("Moved %d orders from orders_default into %s", moved, name)
+
+
+@contextmanager
+def partitions_lock(engine: Engine) -> Iterator[bool]:
+    """
+    Session advisory lock on its own connection, so only one process (e.g.
+    during an overlapping deploy) changes partitions at a time. Yields
+    False when another process holds it. Always acquired on other dialects.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    with engine.connect() as conn:
+        acquired = conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": PARTITIONS_LOCK_KEY}
+        ).scalar()
+        conn.commit()  # the lock outlives the transaction; don't sit idle in one
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PARTITIONS_LOCK_KEY})
+                    conn.commit()
+                except Exception:
+                    # Closing the session is the only other way to release it
+                    conn.invalidate()
+                    raise
+
+
+def ensure_partitions(engine: Engine, ahead: int = PARTITIONS_AHEAD) -> int:
+    """
+    Create the partitioned orders table on a fresh database and make sure
+    partitions exist for this month and the next `ahead` ones. Runs at
+    startup and from maintenance. A month that can't be created is logged
+    and skipped (its rows keep going to DEFAULT). Returns months that
+    failed. Does nothing unless ORDERS_PARTITIONED is set and the DB is
+    PostgreSQL, and skips the months while another process holds
+    partitions_lock.
+    """
+    if not ORDERS_PARTITIONED or engine.dialect.name != "postgresql":
+        return 0
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT to_regclass('orders')")).scalar()
+        if exists is None:
+            # Wait for (rather than skip) another process creating it, or
+            # create_all would create a plain orders table
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITIONS_LOCK_KEY})
+            exists = conn.execute(text("SELECT to_regclass('orders')")).scalar()
+        if exists is None:
+            _create_partitioned_orders(conn)
+            logger.info("Created partitioned orders table")
+        elif not is_partitioned(conn):
+            logger.warning(
+                "ORDERS_PARTITIONED is set but orders is a plain table; "
+                "run `python manage_orders.py partition` to migrate it"
+            )
+            return 0
+    failed = 0
+    this_month = month_start(datetime.now(timezone.utc).date())
+    with partitions_lock(engine) as acquired:
+        if not acquired:
+            logger.info("Another process is managing partitions; skipped")
+            return 0
+        for offset in range(ahead + 1):
+            month = add_months(this_month, offset)
+            try:
+                # One transaction per month, so one failure doesn't undo the rest
+                with engine.begin() as conn:
+                    create_month_partition(conn, month)
+            except Exception as e:
+                failed += 1
+                logger.error("Could not create partition %s: %s", partition_name(month), e)
+    return failed
+
+
+def migrate_to_partitioned(engine: Engine) -> int:
+    """
+    One-off migration of an existing plain orders table to a partitioned one.
+    Runs in a single transaction holding an exclusive lock on orders.
+    Returns the number of rows copied.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            raise RuntimeError("Partitioning requires PostgreSQL")
+        if is_partitioned(conn):
+            return 0
+
+        conn.execute(text("LOCK TABLE orders IN ACCESS EXCLUSIVE MODE"))
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence('orders', 'order_id')")).scalar()
+
+        # Move the old table, its indexes and its sequence out of the way
+        conn.execute(text("ALTER TABLE orders RENAME TO orders_unpartitioned"))
+        for (index_name,) in conn.execute(text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE tablename = 'orders_unpartitioned' AND schemaname = current_schema()"
+        )).all():
+            conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_old"'))
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO orders_order_id_seq_old"))
+
+        _create_partitioned_orders(conn)
+
+        first, last = conn.execute(text(
+            "SELECT min(created_at), max(created_at) FROM orders_unpartitioned"
+        )).one()
+        this_month = month_start(datetime.now(timezone.utc).date())
+        month = month_start(first.date()) if first else this_month
+        until = add_months(max(month_start(last.date()) if last else this_month, this_month), PARTITIONS_AHEAD)
+        while month <= until:
+            create_month_partition(conn, month)
+            month = add_months(month, 1)
+
+        columns = ", ".join(ORDER_COLUMNS)
+        copied = conn.execute(text(
+            f"INSERT INTO orders ({columns}) SELECT {columns} FROM orders_unpartitioned"
+        )).rowcount
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('orders', 'order_id'), "
+            "COALESCE((SELECT max(order_id) FROM orders), 0) + 1, false)"
+        ))
+        conn.execute(text("DROP TABLE orders_unpartitioned"))
+        if sequence:
+            conn.execute(text("DROP SEQUENCE IF EXISTS orders_order_id_seq_old"))
+    return copied
+
+
+def _month_tables(names) -> list[tuple[date, str]]:
+    tables = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            tables.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(tables)
+
+
+def _month_partitions(conn: Connection) -> list[tuple[date, str]]:
+    return _month_tables(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'orders'"
+    )).scalars().all())
+
+
+def _detached_months(conn: Connection) -> list[tuple[date, str]]:
+    """Month tables that are no longer partitions of orders (an archive stopped midway)"""
+    return _month_tables(conn.execute(text(
+        "SELECT c.relname FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relkind = 'r' AND n.nspname = current_schema() "
+        "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+    )).scalars().all())
+
+
+# -----------------------------
+# ARCHIVAL
+# -----------------------------
+
+def _row_to_json(row) -> str:
+    return json.dumps(dict(row._mapping), default=str)
+
+
+@contextmanager
+def _archive_file_guard(archive_file: Optional[str]):
+    """Cut the archive file back to its old size if the database step after an append fails"""
+    if not archive_file:
+        yield
+        return
+    size = os.path.getsize(archive_file) if os.path.exists(archive_file) else 0
+    try:
+        yield
+    except BaseException:
+        with open(archive_file, "r+b") as f:
+            f.truncate(size)
+        raise
+
+
+def _append_archive(archive_file: str, lines: Iterable[str]) -> None:
+    """Append NDJSON lines as a new gzip member and fsync before any rows are removed"""
+    with open(archive_file, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+            for line in lines:
+                out.write((line + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _copy_partition(engine: Engine, name: str, archive_file: Optional[str]) -> set:
+    """
+    Copy an attached month partition to the archive. Only the partition is
+    read, so orders stays fully usable. Returns (order_id, crc) of every
+    line written to the file (nothing for orders_archive).
+    """
+    columns = ", ".join(ORDER_COLUMNS)
+    written = set()
+    with engine.begin() as conn:
+        if archive_file:
+            rows = conn.execute(
+                text(f"SELECT {columns} FROM {name}").execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+            )
+
+            def lines():
+                for row in rows:
+                    line = _row_to_json(row)
+                    written.add((row.order_id, zlib.crc32(line.encode("utf-8"))))
+                    yield line
+            _append_archive(archive_file, lines())
+        else:
+            # A rerun after an interrupted archive finds these rows already there
+            conn.execute(text(
+                f"INSERT INTO orders_archive ({columns}) SELECT {columns} FROM {name} "
+                f"ON CONFLICT (order_id) DO NOTHING"
+            ))
+    return written
+
+
+def _detach_partition(engine: Engine, name: str) -> None:
+    """
+    Detach in its own transaction: ACCESS EXCLUSIVE on orders is held only
+    for the catalog change. DETACH CONCURRENTLY isn't possible while a
+    DEFAULT partition exists, so lock_timeout keeps the lock request from
+    queueing every orders query behind a long-running one.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{ARCHIVE_LOCK_TIMEOUT_MS}ms'"))
+        conn.execute(text(f"ALTER TABLE orders DETACH PARTITION {name}"))
+
+
+def _finish_detached(engine: Engine, name: str, archive_file: Optional[str], written: set) -> int:
+    """
+    Bring the archive up to date with a detached month table, then drop it.
+    Rows added or changed since the copy are written again (a later file
+    line for an order_id replaces the earlier one). Returns rows archived.
+    """
+    columns = ", ".join(ORDER_COLUMNS)
+    with _archive_file_guard(archive_file), engine.begin() as conn:
+        moved = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+        if archive_file:
+            rows = conn.execute(
+                text(f"SELECT {columns} FROM {name}").execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+            )
+
+            def changed():
+                for row in rows:
+                    line = _row_to_json(row)
+                    if (row.order_id, zlib.crc32(line.encode("utf-8"))) not in written:
+                        yield line
+            _append_archive(archive_file, changed())
+        else:
+            updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in ORDER_COLUMNS if c != "order_id")
+            archived = ", ".join(f"orders_archive.{c}" for c in ORDER_COLUMNS)
+            incoming = ", ".join(f"EXCLUDED.{c}" for c in ORDER_COLUMNS)
+            conn.execute(text(
+                f"INSERT INTO orders_archive ({columns}) SELECT {columns} FROM {name} "
+                f"ON CONFLICT (order_id) DO UPDATE SET {updates} "
+                f"WHERE ({archived}) IS DISTINCT FROM ({incoming})"
+            ))
+        conn.execute(text(f"DROP TABLE {name}"))
+    return moved
+
+
+def _archive_partition(engine: Engine, name: str, archive_file: Optional[str]) -> int:
+    """
+    Archive a closed month: copy it out while it is still attached (and
+    commit or fsync), detach it in a short transaction, then top up the
+    archive from the detached table and drop it. Returns rows archived.
+    """
+    # On failure the file is cut back to its old size. A month that was
+    # already detached stays as a plain table that the next run finishes
+    # (_detached_months), writing all of its rows once
+    with _archive_file_guard(archive_file):
+        written = _copy_partition(engine, name, archive_file)
+        _detach_partition(engine, name)
+        return _finish_detached(engine, name, archive_file, written)
+
+
+def _archive_rows_batch(conn: Connection, cutoff: datetime, archive_file: Optional[str], batch_size: int) -> int:
+    """Move one batch of rows older than cutoff; returns rows moved"""
+    orders = Order.__table__
+    rows = conn.execute(
+        select(orders)
+        .where(orders.c.created_at < cutoff)
+        .order_by(orders.c.order_id)
+        .limit(batch_size)
+        .with_for_update()
+    ).all()
+    if not rows:
+        return 0
+    if archive_file:
+        # Written and fsynced before the delete; the caller's file guard
+        # cuts it back if the transaction doesn't commit
+        _append_archive(archive_file, (_row_to_json(row) for row in rows))
+    else:
+        conn.execute(insert(OrderArchive.__table__), [dict(row._mapping) for row in rows])
+    conn.execute(delete(orders).where(orders.c.order_id.in_([row.order_id for row in rows])))
+    return len(rows)
+
+
+def archive_orders(
+    engine: Engine,
+    before: Optional[date] = None,
+    archive_file: Optional[str] = None,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> int:
+    """
+    Archive every order created before the month `before` (default: keep
+    ORDERS_HOT_MONTHS months). Rows go to orders_archive, or to a gzip
+    NDJSON file if `archive_file` is given. Returns rows archived (0 when
+    another process holds partitions_lock).
+    """
+    with partitions_lock(engine) as acquired:
+        if not acquired:
+            logger.warning("Another process is archiving or managing partitions; skipped")
+            return 0
+        return _archive_orders(engine, before, archive_file, batch_size)
+
+
+def _archive_orders(engine: Engine, before: Optional[date], archive_file: Optional[str], batch_size: int) -> int:
+    cutoff_month = month_start(before) if before else default_archive_cutoff()
+    cutoff = datetime.combine(cutoff_month, datetime.min.time(), tzinfo=timezone.utc)
+    total = 0
+
+    with engine.connect() as conn:
+        partitioned = is_partitioned(conn)
+        conn.rollback()
+
+    if partitioned:
+        with engine.begin() as conn:
+            leftovers = _detached_months(conn)
+            partitions = _month_partitions(conn)
+        for month, name in leftovers:
+            if month >= cutoff_month:
+                logger.warning("%s is detached from orders but not archived; archive with --before or re-attach it", name)
+                continue
+            # Detached by an earlier run that stopped before the drop
+            moved = _finish_detached(engine, name, archive_file, set())
+            logger.info("Archived %d orders from %s (left detached by an earlier run)", moved, name)
+            total += moved
+        for month, name in partitions:
+            if month >= cutoff_month:
+                break
+            moved = _archive_partition(engine, name, archive_file)
+            logger.info("Archived %d orders from %s", moved, name)
+            total += moved
+
+    # Rows not in a month partition (plain table, or the DEFAULT partition)
+    while True:
+        with _archive_file_guard(archive_file), engine.begin() as conn:
+            moved = _archive_rows_batch(conn, cutoff, archive_file, batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+
+    # Archived orders no longer count anywhere; keep the daily rollup in line
+    from utils.rollups import clear_rollup_before  # utils.rollups imports this module
+    with engine.begin() as conn:
+        clear_rollup_before(conn, cutoff_month)
+
+    return total
@@ -0,0 +1,158 @@
+"""
+Token-bucket rate limiting for login attempts.
+
+Each client IP and each login identifier has a bucket of `burst` tokens
+refilled at `per_minute` tokens per minute; an attempt takes one token.
+Throttled attempts are rejected with 429 before any DB lookup or bcrypt
+work.
+
+Stores:
+- memory (default): per-process, no I/O
+- table: rate_limit_buckets, shared by all workers; one atomic
+  INSERT ... ON CONFLICT DO UPDATE ... RETURNING per bucket. Buckets idle
+  long enough to have refilled are deleted by maintenance (prune_buckets)
+"""
+
+import math
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import case, delete, func, literal, select
+from sqlalchemy.engine import Engine
+
+from database import client_ip
+from models.rate_limit import RateLimitBucket
+from utils.upsert import dialect_insert
+
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+LOGIN_IP_BURST = float(os.getenv("LOGIN_IP_BURST", "20"))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", "20"))
+LOGIN_IDENTIFIER_BURST = float(os.getenv("LOGIN_IDENTIFIER_BURST", "5"))
+LOGIN_IDENTIFIER_PER_MINUTE = float(os.getenv("LOGIN_IDENTIFIER_PER_MINUTE", "5"))
+RATE_LIMIT_PRUNE_BATCH = int(os.getenv("RATE_LIMIT_PRUNE_BATCH", "1000"))
+
+
+def _refill(tokens: float, updated_at: float, now: float, burst: float, rate: float) -> float:
+    return min(burst, tokens + (now - updated_at) * rate)
+
+
+class MemoryStore:
+    """In-process buckets: key -> (tokens, updated_at)"""
+
+    MAX_KEYS = 50000
+
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, burst: float, rate: float) -> float:
+        """Take one token; returns 0 if allowed, else seconds until one is available"""
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated_at, now, burst, rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now, burst, rate)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def _prune(self, now: float, burst: float, rate: float) -> None:
+        # Drop buckets that have refilled completely; they hold no state
+        self._buckets = {
+            key: (tokens, updated_at) for key, (tokens, updated_at) in self._buckets.items()
+            if _refill(tokens, updated_at, now, burst, rate) < burst
+        }
+
+
+class TableStore:
+    """Buckets in the rate_limit_buckets table, shared by all workers"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._insert = dialect_insert(engine.dialect.name)
+
+    def take(self, key: str, burst: float, rate: float) -> float:
+        now = time.time()
+        buckets = RateLimitBucket.__table__
+        stmt = self._insert(buckets).values(
+            key=key, tokens=burst - 1, updated_at=now, allowed=True
+        )
+        refilled = func.least if self.engine.dialect.name == "postgresql" else func.min
+        refilled = refilled(
+            literal(burst),
+            buckets.c.tokens + (literal(now) - buckets.c.updated_at) * rate
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[buckets.c.key],
+            set_={
+                "tokens": case((refilled >= 1, refilled - 1), else_=refilled),
+                "allowed": refilled >= 1,
+                "updated_at": now,
+            }
+        ).returning(buckets.c.tokens, buckets.c.allowed)
+        with self.engine.begin() as conn:
+            tokens, allowed = conn.execute(stmt).one()
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+def prune_buckets(engine: Engine, batch_size: int = RATE_LIMIT_PRUNE_BATCH) -> int:
+    """
+    Delete table buckets idle long enough to have refilled completely;
+    a missing bucket starts full, so no limit changes. Returns rows removed.
+    """
+    refill_seconds = max(
+        LOGIN_IP_BURST * 60 / LOGIN_IP_PER_MINUTE,
+        LOGIN_IDENTIFIER_BURST * 60 / LOGIN_IDENTIFIER_PER_MINUTE,
+    )
+    cutoff = time.time() - refill_seconds
+    buckets = RateLimitBucket.__table__
+    removed = 0
+    while True:
+        with engine.begin() as conn:
+            idle = select(buckets.c.key).where(buckets.c.updated_at < cutoff).limit(batch_size)
+            # updated_at is checked again in case a take() refreshed the bucket meanwhile
+            deleted = conn.execute(
+                delete(buckets).where(buckets.c.key.in_(idle), buckets.c.updated_at < cutoff)
+            ).rowcount
+        removed += deleted
+        if deleted < batch_size:
+            return removed
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if RATE_LIMIT_STORE == "table":
+            from database import engine
+            _store = TableStore(engine)
+        else:
+            _store = MemoryStore()
+    return _store
+
+
+def check_login_rate(request: Request, identifier: str) -> None:
+    """Raise 429 if this IP or identifier is out of login attempts"""
+    store = get_store()
+    retry_after = store.take(
+        f"login:ip:{client_ip(request)}",
+        LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60
+    )
+    if not retry_after:
+        retry_after = store.take(
+            f"login:id:{identifier.lower()}",
+            LOGIN_IDENTIFIER_BURST, LOGIN_IDENTIFIER_PER_MINUTE / 60
+        )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
@@ -0,0 +1,140 @@
+"""
+Heavy reports computed by the background job runner (utils.jobs).
+
+Each report takes a connection (the read replica when configured) and
+the job params ({"start": "YYYY-MM-DD", "end": ...}, both optional) and
+returns a JSON-serialisable dict, or an iterable of row dicts. Row reports
+that can be large are generators over a server-side cursor, so the runner
+can store them chunk by chunk without holding every row in memory.
+"""
+
+from datetime import date
+from typing import Any, Callable, Iterator, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.engine import Connection
+
+from models.customer import Customer
+from models.order import Order
+from models.user import User, UserRole
+from utils.partitions import created_at_range
+from utils.rollups import AGENT_TOTALS, agent_totals
+
+REPORTS: dict[str, Callable[[Connection, dict], Any]] = {}
+
+# Rows fetched per round trip by the streaming reports
+REPORT_FETCH_ROWS = 1000
+
+
+def report(kind: str):
+    """Register a report function under `kind` (see schemas.report.ReportKind)"""
+    def register(fn):
+        REPORTS[kind] = fn
+        return fn
+    return register
+
+
+def _date_range(params: dict) -> tuple[Optional[date], Optional[date]]:
+    start, end = params.get("start"), params.get("end")
+    return (
+        date.fromisoformat(start) if start else None,
+        date.fromisoformat(end) if end else None,
+    )
+
+
+def _order_totals():
+    return [
+        func.count(Order.order_id).label("total_orders"),
+        *[func.coalesce(func.sum(source), 0).label(name) for name, source in AGENT_TOTALS.items()],
+    ]
+
+
+@report("orders-summary")
+def orders_summary(conn: Connection, params: dict) -> dict:
+    """Totals over the whole range (default: full history) and by payment status"""
+    start, end = _date_range(params)
+    in_range = created_at_range(Order.created_at, start, end)
+    totals = conn.execute(select(*_order_totals()).where(*in_range)).one()
+    by_payment = conn.execute(
+        select(Order.payment_status, func.count(Order.order_id))
+        .where(*in_range)
+        .group_by(Order.payment_status)
+    ).all()
+    return {
+        **{key: int(value) for key, value in totals._mapping.items()},
+        "payment_status_summary": {status: count for status, count in by_payment if status},
+    }
+
+
+@report("customer-balances")
+def customer_balances(conn: Connection, params: dict) -> Iterator[dict]:
+    """Order totals per customer (customers without orders get zeros)"""
+    start, end = _date_range(params)
+    rows = conn.execute(
+        select(Customer.id.label("customer_id"), Customer.shop_name, Customer.phone, *_order_totals())
+        .outerjoin(Order, and_(Order.customer_id == Customer.id, *created_at_range(Order.created_at, start, end)))
+        .group_by(Customer.id, Customer.shop_name, Customer.phone)
+        .order_by(Customer.id)
+        .execution_options(yield_per=REPORT_FETCH_ROWS)
+    )
+    for row in rows:
+        yield dict(row._mapping)
+
+
+@report("agents")
+def agents(conn: Connection, params: dict) -> list[dict]:
+    """Order totals for every agent, served from the daily rollup where possible"""
+    start, end = _date_range(params)
+    totals, _ = agent_totals(conn, start, end)
+    rows = conn.execute(
+        select(
+            User.id.label("agent_id"),
+            User.name,
+            *[func.coalesce(totals.c[name], 0).label(name) for name in ["total_orders", *AGENT_TOTALS]],
+        )
+        .outerjoin(totals, totals.c.agent_id == User.id)
+        .where(User.role == UserRole.agent)
+        .order_by(User.id)
+    ).all()
+    return [dict(row._mapping) for row in rows]
+
+
+@report("by-pincode")
+def by_pincode(conn: Connection, params: dict) -> list[dict]:
+    """
+    Customer count, order totals and outstanding trays/bottles per pincode,
+    from one grouped join (customers without a pincode are grouped as null)
+    """
+    start, end = _date_range(params)
+    trays_outside = func.coalesce(func.sum(Order.trays_holding), 0)
+    trays_received = func.coalesce(func.sum(Order.trays_returned), 0)
+    bottles_delivered = func.coalesce(func.sum(Order.bottles_holding), 0)
+    bottles_returned = func.coalesce(func.sum(Order.bottles_returned), 0)
+    rows = conn.execute(
+        select(
+            Customer.pincode,
+            func.count(func.distinct(Customer.id)).label("customers"),
+            *_order_totals(),
+            (trays_outside - trays_received).label("outstanding_trays"),
+            (bottles_delivered - bottles_returned).label("outstanding_bottles"),
+        )
+        .outerjoin(Order, and_(Order.customer_id == Customer.id, *created_at_range(Order.created_at, start, end)))
+        .group_by(Customer.pincode)
+        .order_by(Customer.pincode)
+    ).all()
+    return [dict(row._mapping) for row in rows]
+
+
+@report("orders-export")
+def orders_export(conn: Connection, params: dict) -> Iterator[dict]:
+    """Every order in the range, oldest first"""
+    start, end = _date_range(params)
+    orders = Order.__table__
+    rows = conn.execute(
+        select(orders)
+        .where(*created_at_range(orders.c.created_at, start, end))
+        .order_by(orders.c.order_id)
+        .execution_options(yield_per=REPORT_FETCH_ROWS)
+    )
+    for row in rows:
+        yield dict(row._mapping)
@@ -0,0 +1,226 @@
+"""
+Daily rollups of order totals.
+
+agent_daily_rollup holds per-agent totals for each closed day (before
+today). The maintenance task refreshes the last ROLLUP_REFRESH_DAYS closed
+days on every run, so late edits to recent orders are picked up; the first
+run backfills all history in one grouped statement. rollup_state records
+which days are covered, and reports combine rollup rows for covered days
+with a live aggregate over the rest of the range (e.g. today).
+
+Writes that change orders of older closed days (order edits and deletes,
+bulk updates/deletes, customer removal, imports with historical
+created_at) call mark_rollup_dirty() in their transaction; the next
+refresh recomputes those days. Archival removes the archived days' rows
+directly (archived orders are not counted live either).
+"""
+
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import Date, and_, cast, delete, func, insert, or_, select, union_all
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from models.order import Order
+from models.rollup import AgentDailyRollup, RollupDirtyDay, RollupState
+from utils.partitions import created_at_range
+from utils.upsert import dialect_insert
+
+ROLLUP_REFRESH_DAYS = int(os.getenv("ROLLUP_REFRESH_DAYS", "3"))
+AGENT_ROLLUP = "agent_daily"
+
+# Rollup column -> Order column summed into it
+AGENT_TOTALS = {
+    "total_trays_outside": Order.trays_holding,
+    "total_trays_received": Order.trays_returned,
+    "total_bottles_delivered": Order.bottles_holding,
+    "total_bottles_returned": Order.bottles_returned,
+    "total_bottles_damaged": Order.bottles_damaged,
+}
+
+
+def day_of(column, dialect_name: str):
+    """Calendar day of a timestamp column (SQLite has no DATE cast)"""
+    if dialect_name == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _rollup_days(conn: Connection, first: date, last: date) -> None:
+    """Recompute agent_daily_rollup rows for first..last (inclusive)"""
+    rollup = AgentDailyRollup.__table__
+    day = day_of(Order.created_at, conn.dialect.name)
+    conn.execute(delete(rollup).where(rollup.c.day >= first, rollup.c.day <= last))
+    grouped = (
+        select(
+            day.label("day"),
+            Order.delivered_by.label("agent_id"),
+            func.count(Order.order_id).label("total_orders"),
+            *[func.coalesce(func.sum(source), 0).label(name) for name, source in AGENT_TOTALS.items()],
+        )
+        .where(Order.delivered_by.is_not(None), *created_at_range(Order.created_at, first, last))
+        .group_by(day, Order.delivered_by)
+    )
+    conn.execute(insert(rollup).from_select(
+        ["day", "agent_id", "total_orders", *AGENT_TOTALS], grouped
+    ))
+
+
+def _as_day(value: Union[date, datetime, str]) -> date:
+    # created_at values read back from the database are in the session time
+    # zone, the same day boundary as day_of() (no conversion to UTC)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def mark_rollup_dirty(conn: Union[Connection, Session], values: Iterable[Union[date, datetime, str]]) -> None:
+    """
+    Record that orders on these days (created_at values as read from the
+    database, or dates) changed; closed days are recomputed by the next refresh. Run it in the
+    transaction making the change (a Session or a Connection).
+    """
+    today = datetime.now(timezone.utc).date()
+    days = sorted({day for day in map(_as_day, filter(None, values)) if day < today})
+    if not days:
+        return
+    dirty = RollupDirtyDay.__table__
+    dialect = conn.get_bind().dialect if isinstance(conn, Session) else conn.dialect
+    insert = dialect_insert(dialect.name)
+    conn.execute(
+        insert(dirty)
+        .values([{"day": day, "version": 1} for day in days])
+        .on_conflict_do_update(index_elements=["day"], set_={"version": dirty.c.version + 1})
+    )
+
+
+def _refresh_dirty_days(conn: Connection, covered_from: date, covered_through: date) -> int:
+    """Recompute marked days inside the covered range and clear their marks"""
+    dirty = RollupDirtyDay.__table__
+    marks = conn.execute(select(dirty.c.day, dirty.c.version)).all()
+    if not marks:
+        return 0
+    days = [mark.day for mark in marks if covered_from <= mark.day <= covered_through]
+    for day in days:
+        _rollup_days(conn, day, day)
+    # Days marked again meanwhile keep their (newer) mark for the next run
+    conn.execute(delete(dirty).where(or_(*[
+        and_(dirty.c.day == mark.day, dirty.c.version == mark.version) for mark in marks
+    ])))
+    return len(days)
+
+
+def clear_rollup_before(conn: Connection, cutoff: date) -> None:
+    """Drop rollup rows for days before cutoff (their orders were archived)"""
+    rollup = AgentDailyRollup.__table__
+    conn.execute(delete(rollup).where(rollup.c.day < cutoff))
+
+
+def coverage(conn: Connection, name: str = AGENT_ROLLUP) -> tuple[Optional[date], Optional[date]]:
+    state = conn.execute(
+        select(RollupState.covered_from, RollupState.covered_through).where(RollupState.name == name)
+    ).first()
+    return (state.covered_from, state.covered_through) if state else (None, None)
+
+
+def refresh_agent_rollup(engine: Engine, today: Optional[date] = None) -> int:
+    """
+    Bring agent_daily_rollup up to yesterday and recompute days marked
+    dirty. Returns the number of days recomputed (0 if there are no orders
+    yet).
+    """
+    today = today or datetime.now(timezone.utc).date()
+    yesterday = today - timedelta(days=1)
+    state_table = RollupState.__table__
+
+    with engine.begin() as conn:
+        covered_from, covered_through = coverage(conn)
+        if covered_from is None:
+            # First run: backfill from the oldest order
+            oldest = conn.execute(select(func.min(Order.created_at))).scalar()
+            if oldest is None:
+                return 0
+            first = oldest.date() if isinstance(oldest, datetime) else date.fromisoformat(str(oldest)[:10])
+            covered_from = first
+        else:
+            first = min(covered_through + timedelta(days=1), yesterday - timedelta(days=ROLLUP_REFRESH_DAYS - 1))
+            first = max(first, covered_from)
+        # Read before the aggregates below, so changes after this are seen
+        # by them or keep their mark
+        dirty_days = _refresh_dirty_days(conn, covered_from, min(first - timedelta(days=1), yesterday))
+        if first > yesterday:
+            return dirty_days
+
+        _rollup_days(conn, first, yesterday)
+        conn.execute(delete(state_table).where(state_table.c.name == AGENT_ROLLUP))
+        conn.execute(insert(state_table).values(
+            name=AGENT_ROLLUP, covered_from=covered_from, covered_through=yesterday
+        ))
+    return dirty_days + (yesterday - first).days + 1
+
+
+def _live_agent_totals(start: Optional[date], end: Optional[date]):
+    return (
+        select(
+            Order.delivered_by.label("agent_id"),
+            func.count(Order.order_id).label("total_orders"),
+            *[func.coalesce(func.sum(source), 0).label(name) for name, source in AGENT_TOTALS.items()],
+        )
+        .where(Order.delivered_by.is_not(None), *created_at_range(Order.created_at, start, end))
+        .group_by(Order.delivered_by)
+    )
+
+
+def _rollup_agent_totals(first: date, last: date):
+    rollup = AgentDailyRollup.__table__
+    return (
+        select(
+            rollup.c.agent_id,
+            func.sum(rollup.c.total_orders).label("total_orders"),
+            *[func.sum(rollup.c[name]).label(name) for name in AGENT_TOTALS],
+        )
+        .where(rollup.c.day >= first, rollup.c.day <= last)
+        .group_by(rollup.c.agent_id)
+    )
+
+
+def agent_totals(conn, start: Optional[date], end: Optional[date]):
+    """
+    Subquery of per-agent totals (agent_id, total_orders, total_*) for
+    start..end (inclusive, either may be open). Days covered by the rollup
+    are summed from agent_daily_rollup, the rest is aggregated live from
+    orders. Returns (subquery, source).
+    """
+    covered_from, covered_through = coverage(conn)
+    if covered_from is None:
+        return _live_agent_totals(start, end).subquery(), "live"
+
+    first = max(start, covered_from) if start else covered_from
+    last = min(end, covered_through) if end else covered_through
+    if first > last:
+        # Range lies entirely outside the rollup
+        return _live_agent_totals(start, end).subquery(), "live"
+
+    parts = [_rollup_agent_totals(first, last)]
+    if start is None or start < covered_from:
+        parts.append(_live_agent_totals(start, first - timedelta(days=1)))
+    if end is None or end > covered_through:
+        parts.append(_live_agent_totals(last + timedelta(days=1), end))
+    if len(parts) == 1:
+        return parts[0].subquery(), "rollup"
+
+    combined = union_all(*parts).subquery()
+    totals = (
+        select(
+            combined.c.agent_id,
+            func.sum(combined.c.total_orders).label("total_orders"),
+            *[func.sum(combined.c[name]).label(name) for name in AGENT_TOTALS],
+        )
+        .group_by(combined.c.agent_id)
+        .subquery()
+    )
+    return totals, "rollup+live"
@@ -0,0 +1,93 @@
+"""
+Single-flight coalescing of identical expensive queries.
+
+When several requests ask for the same aggregate at the same time (e.g. a
+dashboard opened on many devices), only the first runs the query. The
+others wait for it and share its result, which is also kept for a short
+TTL so requests arriving just after reuse it too.
+
+Keys are built from the route name plus normalized parameters. Results are
+shared between requests and must be treated as read-only.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+DEFAULT_TTL = float(os.getenv("COALESCE_TTL", "2"))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "expires_at")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.expires_at = 0.0
+
+
+class SingleFlight:
+    """Thread-safe request coalescing with a short result TTL"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], ttl: float | None = None) -> Any:
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.done.is_set() and (
+                call.error is not None or call.expires_at <= time.monotonic()
+            ):
+                # Expired result or failed call: start a fresh one
+                call = None
+            owner = call is None
+            if owner:
+                self._evict_expired()
+                call = _Call()
+                self._calls[key] = call
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            call.expires_at = time.monotonic() + ttl
+        except BaseException as e:
+            call.error = e
+            # Errors are shared with current waiters but never cached
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            raise
+        finally:
+            call.done.set()
+        return call.result
+
+    def invalidate(self) -> None:
+        """Drop all cached results (in-flight calls are left to finish)"""
+        with self._lock:
+            self._calls = {
+                key: call for key, call in self._calls.items()
+                if not call.done.is_set()
+            }
+
+    def _evict_expired(self) -> None:
+        if len(self._calls) < self.max_entries:
+            return
+        now = time.monotonic()
+        self._calls = {
+            key: call for key, call in self._calls.items()
+            if not call.done.is_set() or call.expires_at > now
+        }
+
+
+coalescer = SingleFlight()
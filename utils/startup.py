@@ -0,0 +1,198 @@
+"""
+Fast startup support for cold starts (e.g. Render free tier spin-up).
+
+FAST_START=1 enables:
+- schema check by version: Base.metadata.create_all (one existence query
+  per table) only runs when the stored schema fingerprint differs from
+  the models; otherwise startup does a single small query
+- lazy routers: the app starts serving /health immediately while routers
+  (and their Pydantic schemas) load in a background thread; other requests
+  wait until they are ready. If loading fails, those requests and
+  /health/ready get 503. email-validator is not deferred: FastAPI imports
+  it at startup whenever it is installed
+
+Unique indexes that upserts rely on are also created here when missing,
+since create_all never adds indexes to existing tables.
+
+Startup phases are timed in `startup_timings` (GET /admin/startup).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger(__name__)
+
+FAST_START = os.getenv("FAST_START", "").lower() in ("1", "true", "yes")
+
+startup_timings: dict[str, float] = {}
+
+
+def process_age() -> float:
+    """Seconds since this process started (falls back to time since import)"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _IMPORTED_AT
+
+
+_IMPORTED_AT = time.perf_counter()
+
+
+def record(phase: str, seconds: float) -> None:
+    startup_timings[phase] = round(seconds * 1000, 1)  # milliseconds
+
+
+@contextmanager
+def timed(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started)
+
+
+# -----------------------------
+# SCHEMA VERSION
+# -----------------------------
+
+_version_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version", _version_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+)
+
+
+def schema_fingerprint(metadata: MetaData, engine: Engine) -> str:
+    """Hash of the DDL the models would create; changes whenever a model does"""
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=engine.dialect)).encode())
+    return digest.hexdigest()
+
+
+def ensure_schema(engine: Engine, metadata: MetaData) -> bool:
+    """
+    Create missing tables unless the stored schema fingerprint matches.
+    Returns True if create_all ran. Without FAST_START this always runs
+    create_all, as before.
+    """
+    if not FAST_START:
+        metadata.create_all(bind=engine)
+        return True
+
+    fingerprint = schema_fingerprint(metadata, engine)
+    try:
+        with engine.connect() as conn:
+            stored = conn.execute(
+                select(schema_version.c.fingerprint).where(schema_version.c.id == 1)
+            ).scalar()
+        if stored == fingerprint:
+            return False
+    except SQLAlchemyError:
+        # schema_version doesn't exist yet
+        pass
+
+    metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        conn.execute(schema_version.delete())
+        conn.execute(schema_version.insert().values(id=1, fingerprint=fingerprint))
+    logger.info("Schema created/verified and version stamped")
+    return True
+
+
+# -----------------------------
+# UPSERT INDEXES
+# -----------------------------
+
+# Names of unique indexes that could not be created (e.g. duplicate rows);
+# code using them for ON CONFLICT falls back to check-then-insert
+missing_unique_indexes: set[str] = set()
+
+
+def _index_exists(conn, name: str) -> bool:
+    if conn.dialect.name == "postgresql":
+        # Checked first: CREATE INDEX IF NOT EXISTS would still lock the table
+        return conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"), {"name": name}
+    ).first() is not None
+
+
+def ensure_unique_indexes(engine: Engine, indexes: list[Index]) -> None:
+    """Create missing unique indexes; failures are logged and recorded"""
+    for index in indexes:
+        try:
+            with engine.begin() as conn:
+                if not _index_exists(conn, index.name):
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+                    logger.info("Created unique index %s", index.name)
+            missing_unique_indexes.discard(index.name)
+        except SQLAlchemyError as e:
+            missing_unique_indexes.add(index.name)
+            logger.error(
+                "Could not create unique index %s (resolve duplicates, see ENV_CONFIG.md): %s",
+                index.name, e
+            )
+
+
+# -----------------------------
+# LAZY ROUTERS
+# -----------------------------
+
+class RoutersGate:
+    """
+    ASGI middleware that holds HTTP requests until lazily loaded routers are
+    included. Paths in `always_open` (health checks) are served right away.
+    `failed` holds the load error, if any; held requests then get 503.
+    """
+
+    def __init__(self, app, ready, failed: list[str], always_open: tuple[str, ...] = ("/health",)):
+        self.app = app
+        self.ready = ready
+        self.failed = failed
+        self.always_open = always_open
+        self._first_response_recorded = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            if not scope["path"].startswith(self.always_open):
+                await self.ready.wait()
+                if self.failed:
+                    await self._unavailable(send)
+                    return
+            if not self._first_response_recorded:
+                self._first_response_recorded = True
+                await self.app(scope, receive, send)
+                record("first_response_after_process_start", process_age())
+                return
+        await self.app(scope, receive, send)
+
+    async def _unavailable(self, send) -> None:
+        body = json.dumps({"detail": "Service failed to start", "status_code": 503}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
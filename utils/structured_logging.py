@@ -0,0 +1,208 @@
+"""
+Non-blocking structured logging.
+
+configure_logging() replaces the root handlers with a single QueueHandler:
+request threads only put the LogRecord on an in-memory queue, and a
+QueueListener thread does the formatting (message interpolation, JSON
+encoding, tracebacks) and the stream I/O. Log with %-style arguments
+(logger.info("x=%s", x)) so interpolation also happens on that thread.
+
+Every record carries the current request ID (X-Request-ID header, or a
+generated one, echoed back on the response). Records logged with
+extra={"sample_key": ...} are sampled: the first LOG_SAMPLE_BURST per key
+in each LOG_SAMPLE_WINDOW seconds are kept, the rest are counted and the
+count is reported on the next record that gets through.
+
+LOG_FORMAT=text keeps the previous human-readable line format.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "5"))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+REQUEST_ID_HEADER = "x-request-id"
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {
+    "message", "asctime", "request_id", "sample_key", "color_message",
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+# -----------------------------
+# FILTERS (run on the caller's thread, kept cheap)
+# -----------------------------
+
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the request ID of the request that logged it"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Rate-limit records that set extra={"sample_key": ...}"""
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._windows: dict[str, list] = {}  # key -> [window_start, logged, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+
+# -----------------------------
+# QUEUE + FORMATTING (run on the listener thread)
+# -----------------------------
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues the record untouched. The stdlib version
+    formats the message and traceback on the caller's thread; here that
+    work is left to the listener's formatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        record.request_id = getattr(record, "request_id", "-")
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", None)
+        return f"{line} (+{suppressed} similar suppressed)" if suppressed else line
+
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Route all logging through one queue and a background listener thread.
+    Safe to call more than once; returns the running listener.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(
+        TextFormatter(TEXT_FORMAT) if LOG_FORMAT == "text" else JsonFormatter()
+    )
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    # uvicorn installs its own synchronous handlers; send its records
+    # (including access logs) through the queue as well
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Drain the queue on interpreter exit so the last records are written
+    atexit.register(_listener.stop)
+    return _listener
+
+
+# -----------------------------
+# REQUEST IDS
+# -----------------------------
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware: take the request ID from X-Request-ID (or generate
+    one), make it available to log records, and echo it on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,15 @@
+"""
+Dialect-specific INSERT for ON CONFLICT upserts (PostgreSQL and SQLite
+share the same on_conflict_do_nothing / on_conflict_do_update API).
+"""
+
+
+def dialect_insert(dialect_name: str):
+    """Return the insert() construct supporting ON CONFLICT for this dialect"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT is not supported on {dialect_name}")
+    return insert
@@ -0,0 +1,153 @@
+"""
+Write-behind buffers for low-value writes on hot paths.
+
+Instead of committing a small UPDATE inside the request (e.g. last_login on
+every /auth/login), handlers record the value in memory and a background
+task in main.lifespan flushes all pending values periodically in one
+set-based statement.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Hashable
+
+from sqlalchemy import DateTime, Integer, String, bindparam, column, update, values
+from sqlalchemy.engine import Engine
+
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "10"))
+
+
+class WriteBehindBuffer:
+    """
+    Thread-safe map of pending values, flushed in batches.
+    Recording the same key twice keeps only the latest value.
+    """
+
+    def __init__(self, name: str, flush_fn: Callable[[Engine, dict], None]):
+        self.name = name
+        self._flush_fn = flush_fn
+        self._pending: dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._pending[key] = value
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def flush(self, engine: Engine) -> int:
+        """Write all pending values; returns the number of rows flushed"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            self._flush_fn(engine, batch)
+        except Exception:
+            # Put the batch back without overwriting newer values
+            with self._lock:
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+            raise
+        return len(batch)
+
+
+# -----------------------------
+# LAST LOGIN
+# -----------------------------
+
+def _flush_last_login(engine: Engine, batch: dict[int, datetime]) -> None:
+    users = User.__table__
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # UPDATE users SET last_login = v.ts FROM (VALUES ...) AS v(id, ts)
+            v = values(
+                column("id", Integer),
+                column("ts", DateTime(timezone=True)),
+                name="v"
+            ).data(list(batch.items()))
+            conn.execute(
+                update(users)
+                .where(users.c.id == v.c.id)
+                .values(last_login=v.c.ts)
+            )
+        else:
+            # SQLite has no VALUES column aliases; one executemany instead
+            conn.execute(
+                update(users)
+                .where(users.c.id == bindparam("user_id"))
+                .values(last_login=bindparam("ts")),
+                [{"user_id": user_id, "ts": ts} for user_id, ts in batch.items()]
+            )
+
+
+last_login_buffer = WriteBehindBuffer("last_login", _flush_last_login)
+
+
+# -----------------------------
+# PASSWORD REHASH
+# -----------------------------
+
+def _flush_password_rehash(engine: Engine, batch: dict[int, tuple[str, str]]) -> None:
+    """
+    Store upgraded hashes. Each row is only updated if its password is still
+    the one that was verified, so a concurrent password change always wins.
+    """
+    users = User.__table__
+    rows = [(user_id, old, new) for user_id, (old, new) in batch.items()]
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            v = values(
+                column("id", Integer),
+                column("old_hash", String),
+                column("new_hash", String),
+                name="v"
+            ).data(rows)
+            conn.execute(
+                update(users)
+                .where(users.c.id == v.c.id, users.c.password == v.c.old_hash)
+                .values(password=v.c.new_hash)
+            )
+        else:
+            conn.execute(
+                update(users)
+                .where(users.c.id == bindparam("user_id"), users.c.password == bindparam("old_hash"))
+                .values(password=bindparam("new_hash")),
+                [{"user_id": i, "old_hash": old, "new_hash": new} for i, old, new in rows]
+            )
+
+
+password_rehash_buffer = WriteBehindBuffer("password_rehash", _flush_password_rehash)
+
+BUFFERS = [last_login_buffer, password_rehash_buffer]
+
+
+def flush_all(engine: Engine) -> None:
+    """Flush every buffer; a failing buffer doesn't block the others"""
+    for buffer in BUFFERS:
+        try:
+            count = buffer.flush(engine)
+            if count:
+                logger.debug("Flushed %d pending %s updates", count, buffer.name)
+        except Exception as e:
+            logger.error("Write-behind flush of %s failed: %s", buffer.name, e)
+
+
+async def run_flusher(engine: Engine, interval: float = FLUSH_INTERVAL) -> None:
+    """Background task: flush all buffers every `interval` seconds"""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(flush_all, engine)
+    except asyncio.CancelledError:
+        # Final flush on shutdown so no timestamps are lost
+        await asyncio.to_thread(flush_all, engine)
+        raise